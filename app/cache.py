@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import math
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.metrics import CACHE_EVENTS
+
+# Entries are dropped by version bumps on writes, the TTL only bounds memory
+CACHE_EXPIRE = 600
+CACHE_PREFIX = "fastapi-cache"
+VERSION_PREFIX = f"{CACHE_PREFIX}:version"
+INVALIDATION_CHANNEL = f"{CACHE_PREFIX}:invalidate"
+
+# In-process tier: hot keys and tag versions are served without a Redis round trip.
+# The TTL bounds staleness if an invalidation message from another worker is lost.
+LOCAL_MAX_ENTRIES = 1024
+LOCAL_EXPIRE = 60
+
+# A recompute slower than this lets the waiting workers run the query themselves
+RECOMPUTE_LOCK_EXPIRE = 10
+RECOMPUTE_POLL_INTERVAL = 0.05
+
+redis: aioredis.Redis | None = None
+stats = Counter()
+
+# tag -> (expires_at, version), kept in sync across workers through pub/sub
+local_versions: dict[str, tuple[float, int]] = {}
+invalidations = 0
+
+# Repeated invalidations waiting for the replicas
+delayed_invalidations: set[asyncio.Task] = set()
+
+# cache key -> result of the recompute running in this worker
+inflight: dict[str, asyncio.Future] = {}
+
+
+class TwoTierBackend(RedisBackend):
+    """RedisBackend with a bounded in-process LRU in front of it."""
+
+    def __init__(self, redis, max_entries: int = LOCAL_MAX_ENTRIES, expire: int = LOCAL_EXPIRE):
+        super().__init__(redis)
+        self.max_entries = max_entries
+        self.expire = expire
+        self.local: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get_local(self, key: str) -> tuple[int, bytes | None]:
+        entry = self.local.get(key)
+        if entry is None:
+            return 0, None
+        expires_at, value = entry
+        ttl = expires_at - time.monotonic()
+        if ttl <= 0:
+            del self.local[key]
+            return 0, None
+        self.local.move_to_end(key)
+        return math.ceil(ttl), value
+
+    def set_local(self, key: str, value: bytes, expire: int | None = None):
+        expire = min(expire, self.expire) if expire and expire > 0 else self.expire
+        self.local[key] = (time.monotonic() + expire, value)
+        self.local.move_to_end(key)
+        while len(self.local) > self.max_entries:
+            self.local.popitem(last=False)
+
+    async def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+        ttl, value = self.get_local(key)
+        if value is not None:
+            count("local_hits")
+            return ttl, value
+        ttl, value = await super().get_with_ttl(key)
+        if value is None:
+            count("misses")
+        else:
+            count("redis_hits")
+            self.set_local(key, value, ttl)
+        return ttl, value
+
+    async def get(self, key: str) -> bytes | None:
+        _, value = await self.get_with_ttl(key)
+        return value
+
+    async def set(self, key: str, value: bytes, expire: int | None = None):
+        await super().set(key, value, expire)
+        self.set_local(key, value, expire)
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        if namespace:
+            for local_key in [k for k in self.local if k.startswith(f"{namespace}:")]:
+                del self.local[local_key]
+        elif key:
+            self.local.pop(key, None)
+        return await super().clear(namespace, key)
+
+
+def count(event: str):
+    stats[event] += 1
+    CACHE_EVENTS.labels(event).inc()
+
+
+def init_cache(client: aioredis.Redis):
+    global redis
+    redis = client
+    FastAPICache.init(TwoTierBackend(client), prefix=CACHE_PREFIX)
+
+
+def cache_stats() -> dict[str, int]:
+    return {
+        "local_hits": stats["local_hits"],
+        "redis_hits": stats["redis_hits"],
+        "misses": stats["misses"],
+        "coalesced": stats["coalesced"],
+        "local_entries": len(FastAPICache.get_backend().local) if redis is not None else 0,
+    }
+
+
+def drop_local_versions(tags=None):
+    global invalidations
+    invalidations += 1
+    if tags is None:
+        local_versions.clear()
+    for tag in tags or ():
+        local_versions.pop(tag, None)
+
+
+async def get_versions(tags: list[str]) -> list[int]:
+    if redis is None or not tags:
+        return [0] * len(tags)
+    now = time.monotonic()
+    versions = {
+        tag: entry[1] for tag in tags if (entry := local_versions.get(tag)) and entry[0] > now
+    }
+    missing = [tag for tag in tags if tag not in versions]
+    if missing:
+        seen_invalidations = invalidations
+        fetched = await redis.mget([f"{VERSION_PREFIX}:{tag}" for tag in missing])
+        for tag, version in zip(missing, fetched):
+            versions[tag] = int(version or 0)
+            # An invalidation arrived while we were waiting, the fetched value may be stale
+            if seen_invalidations == invalidations:
+                local_versions[tag] = (now + LOCAL_EXPIRE, versions[tag])
+    return [versions[tag] for tag in tags]
+
+
+async def invalidate(*tags: str):
+    """Bump the versions of the tags, cached entries built on older versions are never read again."""
+    if redis is None:
+        return
+    await bump_versions(tags)
+    if settings.DB_REPLICA_URLS:
+        # Entries rebuilt from a lagging replica meanwhile are dropped once it has caught up
+        task = asyncio.create_task(bump_versions(tags, delay=settings.DB_REPLICA_MAX_LAG))
+        delayed_invalidations.add(task)
+        task.add_done_callback(delayed_invalidations.discard)
+
+
+async def bump_versions(tags, delay: float = 0):
+    await asyncio.sleep(delay)
+    drop_local_versions(tags)
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{VERSION_PREFIX}:{tag}")
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps(tags))
+            await pipe.execute()
+    except Exception:
+        logging.warning(f"Не удалось сбросить кэш для {tags}", exc_info=True)
+
+
+async def listen_invalidations():
+    """Drop tag versions bumped by other workers, runs for the lifetime of the app."""
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Messages sent while we were not subscribed are lost
+                drop_local_versions()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        drop_local_versions(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.warning("Потеряна подписка на сброс кэша, переподключаюсь", exc_info=True)
+            drop_local_versions()
+            await asyncio.sleep(1)
+
+
+def versioned_key(*tags: str):
+    """Key builder for @cache that embeds the current versions of the tags.
+
+    Tags may reference arguments of the cached function, e.g. "hotel:{hotel_id}".
+    """
+
+    async def key_builder(func, namespace: str = "", *, request=None, response=None, args, kwargs):
+        arguments = inspect.signature(func).bind(*args, **kwargs).arguments
+        arguments = {
+            name: value for name, value in arguments.items() if not isinstance(value, AsyncSession)
+        }
+        versions = await get_versions([tag.format(**arguments) for tag in tags])
+        digest = hashlib.md5(f"{arguments}:{versions}".encode()).hexdigest()
+        return f"{namespace}:{func.__module__}.{func.__name__}:{digest}"
+
+    return key_builder
+
+
+async def wait_for_recompute(key: str, lock: str):
+    deadline = time.monotonic() + RECOMPUTE_LOCK_EXPIRE
+    while time.monotonic() < deadline:
+        await asyncio.sleep(RECOMPUTE_POLL_INTERVAL)
+        cached = await redis.get(key)
+        if cached is not None:
+            return FastAPICache.get_coder().decode(cached)
+        if not await redis.exists(lock):
+            break
+    raise LookupError(key)
+
+
+async def recompute(key: str, func, *args, **kwargs):
+    lock = f"{key}:lock"
+    try:
+        if not await redis.set(lock, 1, nx=True, ex=RECOMPUTE_LOCK_EXPIRE):
+            result = await wait_for_recompute(key, lock)
+            count("coalesced")
+            return result
+    except Exception:
+        # Redis is down or the other worker gave up, fall back to the database
+        return await func(*args, **kwargs)
+    try:
+        result = await func(*args, **kwargs)
+        # Waiters poll the key and give up once the lock is gone, so the value goes first.
+        # @cache sets it once more on the way out.
+        try:
+            backend = FastAPICache.get_backend()
+            await backend.set(key, FastAPICache.get_coder().encode(result), CACHE_EXPIRE)
+        except Exception:
+            logging.warning(f"Не удалось сохранить {key} в кэш", exc_info=True)
+        return result
+    finally:
+        try:
+            await redis.delete(lock)
+        except Exception:
+            pass
+
+
+def single_flight(key_builder):
+    """Run one recompute per cache key at a time, the other callers wait for its result.
+
+    Goes under @cache with the same key_builder, so it only runs on cache misses.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if redis is None:
+                return await func(*args, **kwargs)
+            key = await key_builder(func, f"{CACHE_PREFIX}:", args=args, kwargs=kwargs)
+            if future := inflight.get(key):
+                try:
+                    result = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # The leading request was cancelled, not this one
+                    if not future.cancelled():
+                        raise
+                    return await wrapper(*args, **kwargs)
+                count("coalesced")
+                return result
+
+            future = asyncio.get_running_loop().create_future()
+            inflight[key] = future
+            try:
+                result = await recompute(key, func, *args, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Nobody may be waiting, do not log it as never retrieved
+                future.exception()
+                raise
+            else:
+                future.set_result(result)
+            finally:
+                del inflight[key]
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import csv
+import sys
+from contextlib import ExitStack
+from itertools import islice
+from typing import Iterable, Iterator
+
+import anyio
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session_maker_null_pool
+from app.models import FacilitiesOrm, HotelsOrm, RoomsOrm
+from app.schemas.catalogue import (
+    HotelImport,
+    ImportResult,
+    ImportRowError,
+    RoomFacilityImport,
+    RoomImport,
+)
+
+CATALOGUE_FILES = ("hotels", "rooms", "rooms_facilities")
+COPY_BATCH_SIZE = 10_000
+MAX_REPORTED_ERRORS = 100
+
+Rows = Iterable[tuple[int, dict | str]]
+
+
+def file_format(filename: str | None) -> str:
+    return "csv" if filename and filename.lower().endswith(".csv") else "ndjson"
+
+
+def read_rows(file: Iterable[str], format: str) -> Iterator[tuple[int, dict | str]]:
+    # NDJSON lines are left as text, pydantic reports broken JSON as a row error
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, {key: value or None for key, value in row.items()}
+    else:
+        for line, row in enumerate(file, start=1):
+            if row.strip():
+                yield line, row
+
+
+async def import_catalogue(
+    db: AsyncSession,
+    hotels: Rows = (),
+    rooms: Rows = (),
+    rooms_facilities: Rows = (),
+) -> tuple[ImportResult, list[ImportRowError]]:
+    """Load hotels, rooms and their facilities with COPY inside the current transaction.
+
+    Hotel and room ids are local to the catalogue and are shifted past the ids
+    already in the database. If any errors are returned the caller must roll back.
+    """
+    # Nobody else may take ids until the sequences are moved past the catalogue
+    await db.execute(text("LOCK TABLE hotels, rooms IN SHARE ROW EXCLUSIVE MODE"))
+    hotel_offset = await db.scalar(select(func.coalesce(func.max(HotelsOrm.id), 0)))
+    room_offset = await db.scalar(select(func.coalesce(func.max(RoomsOrm.id), 0)))
+    facility_ids = set(await db.scalars(select(FacilitiesOrm.id)))
+    raw_connection = await (await db.connection()).get_raw_connection()
+    connection = raw_connection.driver_connection
+
+    result = ImportResult()
+    errors: list[ImportRowError] = []
+    hotel_ids: set[int] = set()
+    room_ids: set[int] = set()
+
+    def validate(file: str, model: type[BaseModel], rows: Rows) -> Iterator[tuple[int, BaseModel]]:
+        for line, row in rows:
+            if len(errors) >= MAX_REPORTED_ERRORS:
+                return
+            try:
+                if isinstance(row, str):
+                    yield line, model.model_validate_json(row)
+                else:
+                    yield line, model.model_validate(row)
+            except ValidationError as e:
+                message = "; ".join(
+                    f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()
+                )
+                errors.append(ImportRowError(file=file, line=line, error=message))
+
+    def hotel_records():
+        for line, hotel in validate("hotels", HotelImport, hotels):
+            if hotel.id in hotel_ids:
+                errors.append(ImportRowError(file="hotels", line=line, error="duplicate id"))
+                continue
+            hotel_ids.add(hotel.id)
+            yield hotel_offset + hotel.id, hotel.title, hotel.location
+
+    def room_records():
+        for line, room in validate("rooms", RoomImport, rooms):
+            if room.id in room_ids:
+                errors.append(ImportRowError(file="rooms", line=line, error="duplicate id"))
+                continue
+            if room.hotel_id not in hotel_ids:
+                error = f"hotel {room.hotel_id} is not in the catalogue"
+                errors.append(ImportRowError(file="rooms", line=line, error=error))
+                continue
+            room_ids.add(room.id)
+            yield (
+                room_offset + room.id,
+                hotel_offset + room.hotel_id,
+                room.title,
+                room.description,
+                room.price,
+                room.quantity,
+            )
+
+    def room_facility_records():
+        for line, link in validate("rooms_facilities", RoomFacilityImport, rooms_facilities):
+            if link.room_id not in room_ids:
+                error = f"room {link.room_id} is not in the catalogue"
+            elif link.facility_id not in facility_ids:
+                error = f"facility {link.facility_id} not found"
+            else:
+                yield room_offset + link.room_id, link.facility_id
+                continue
+            errors.append(ImportRowError(file="rooms_facilities", line=line, error=error))
+
+    async def copy(table: str, columns: list[str], records: Iterable[tuple]) -> int:
+        count = 0
+        records = iter(records)
+        # Reading and validating the rows is CPU work, it runs off the event loop
+        while batch := await anyio.to_thread.run_sync(list, islice(records, COPY_BATCH_SIZE)):
+            # After the first error rows are only validated, the import is rolled back
+            if not errors:
+                await connection.copy_records_to_table(table, records=batch, columns=columns)
+            count += len(batch)
+        return count
+
+    result.hotels = await copy("hotels", ["id", "title", "location"], hotel_records())
+    result.rooms = await copy(
+        "rooms",
+        ["id", "hotel_id", "title", "description", "price", "quantity"],
+        room_records(),
+    )
+    result.rooms_facilities = await copy(
+        "rooms_facilities", ["room_id", "facility_id"], room_facility_records()
+    )
+    if errors:
+        return result, errors
+
+    for table, offset, ids in (
+        ("hotels", hotel_offset, hotel_ids),
+        ("rooms", room_offset, room_ids),
+    ):
+        if ids:
+            sequence = func.pg_get_serial_sequence(table, "id")
+            await db.execute(select(func.setval(sequence, offset + max(ids))))
+    return result, errors
+
+
+async def main(args: argparse.Namespace) -> int:
+    with ExitStack() as stack:
+        sources = {}
+        for name in CATALOGUE_FILES:
+            path = getattr(args, name)
+            if path:
+                file = stack.enter_context(open(path, encoding="utf-8", newline=""))
+                sources[name] = read_rows(file, file_format(path))
+
+        async with async_session_maker_null_pool() as session:
+            result, errors = await import_catalogue(session, **sources)
+            if errors:
+                await session.rollback()
+                for error in errors:
+                    print(f"{error.file}:{error.line}: {error.error}", file=sys.stderr)
+                return 1
+            await session.commit()
+    print(result.model_dump_json())
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import of a hotel catalogue")
+    parser.add_argument("--hotels", help="hotels .ndjson or .csv: id,title,location")
+    parser.add_argument(
+        "--rooms", help="rooms .ndjson or .csv: id,hotel_id,title,description,price,quantity"
+    )
+    parser.add_argument(
+        "--rooms-facilities", help="room facilities .ndjson or .csv: room_id,facility_id"
+    )
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,7 +1,14 @@
+import os
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
+    # Adds X-DB-Queries and X-DB-Time to every response
+    DEBUG: bool = False
+    # Seconds the event loop may be blocked before the blocking stack is logged, off if unset
+    LOOP_LAG_THRESHOLD: float | None = None
+
     DB_HOST: str
     DB_PORT: int
     DB_USER: str
@@ -19,10 +26,55 @@ class Settings(BaseSettings):
     def DB_URL(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    # Seconds, -1 keeps connections open forever
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    # Connections opened on startup per engine, at most DB_POOL_SIZE, 0 to skip
+    DB_POOL_WARMUP: int = 5
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # PgBouncer in transaction mode, turns off prepared statement caching
+    DB_PGBOUNCER: bool = False
+
+    # Statements slower than this are logged and kept for GET /admin/slow-queries, off if unset
+    SLOW_QUERY_SECONDS: float | None = None
+    # Share of slow SELECTs run again under EXPLAIN (ANALYZE, BUFFERS) for their plan
+    SLOW_QUERY_EXPLAIN_RATE: float = 0.1
+
+    # Read-only endpoints are spread over these, the primary serves them if empty
+    DB_REPLICA_URLS: list[str] = []
+    # Seconds a replica may be behind: a user reads from the primary this long after a write
+    DB_REPLICA_MAX_LAG: float = 5
+
+    # The celery worker serves its metrics on this port, off if unset
+    CELERY_METRICS_PORT: int | None = None
+
+    # Sent in X-Admin-Token to the /admin endpoints and to profile a request, off if unset
+    ADMIN_TOKEN: str | None = None
+
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    BCRYPT_ROUNDS: int = 12
+    # Half of the cores, the rest is left to the event loop
+    PASSWORD_HASH_WORKERS: int = max(1, (os.cpu_count() or 2) // 2)
+    # Logins waiting for a worker above this are rejected with 503
+    PASSWORD_HASH_QUEUE: int = 64
+
+    MEDIA_DIR: str = "/home/evalshine/backend/hotelsapi_media"
+    MAX_IMAGE_BYTES: int = 20 * 1024 * 1024
+    MAX_IMAGE_PIXELS: int = 50_000_000
+    MAX_IMAGES_PER_UPLOAD: int = 20
+    # Also write WebP copies of the resized images
+    RESIZE_WEBP: bool = True
+    # Internal nginx location over MEDIA_DIR, files are then sent by nginx
+    MEDIA_ACCEL_PREFIX: str | None = None
+
+    CHECKIN_NOTIFICATIONS_FILE: str = "checkin_notifications.ndjson"
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
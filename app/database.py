@@ -1,15 +1,187 @@
+import asyncio
+import itertools
+import time
+import uuid
+from contextvars import ContextVar
+
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import NullPool
+from sqlalchemy import AsyncAdaptedQueuePool, NullPool, event
+from sqlalchemy.util.queue import AsyncAdaptedQueue
 
 from app.config import settings
+from app.metrics import DB_POOL_CHECKED_OUT, DB_POOL_OPEN, DB_POOL_WAIT, DB_QUERY_DURATION
+from app.slow_queries import record_slow_query
+
+
+class TimedQueue(AsyncAdaptedQueue):
+    """Pool queue that keeps track of how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def get(self, block: bool = True, timeout: float | None = None):
+        # Opening a new connection happens after this, it is not a wait for the pool
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            waited = time.perf_counter() - started
+            self.waits += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            DB_POOL_WAIT.observe(waited)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    _queue_class = TimedQueue
+
+    def wait_stats(self) -> dict[str, float]:
+        """Checkouts of the pool and the time they waited for a free connection."""
+        queue = self._pool
+        return {
+            "waits": queue.waits,
+            "wait_seconds": queue.wait_seconds,
+            "max_wait_seconds": queue.max_wait_seconds,
+        }
+
+
+def count_open(dbapi_connection, connection_record):
+    DB_POOL_OPEN.inc()
+
+
+def count_closed(dbapi_connection, connection_record):
+    DB_POOL_OPEN.dec()
+
+
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def count_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def connect_args() -> dict:
+    if settings.DB_PGBOUNCER:
+        # Transaction pooling: a prepared statement may be gone in the next transaction
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+
+
+def create_pooled_engine(url: str):
+    pooled_engine = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args(),
+    )
+    pool = pooled_engine.pool
+    event.listen(pool, "connect", count_open)
+    event.listen(pool, "close", count_closed)
+    event.listen(pool, "checkout", count_checkout)
+    event.listen(pool, "checkin", count_checkin)
+    return pooled_engine
 
-engine = create_async_engine(settings.DB_URL)
-engine_null_pool = create_async_engine(settings.DB_URL, poolclass=NullPool)
+
+engine = create_pooled_engine(settings.DB_URL)
+engine_null_pool = create_async_engine(
+    settings.DB_URL, poolclass=NullPool, connect_args=connect_args()
+)
 
 async_session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
 async_session_maker_null_pool = async_sessionmaker(bind=engine_null_pool, expire_on_commit=False)
 
+replica_engines = [create_pooled_engine(url) for url in settings.DB_REPLICA_URLS]
+replica_session_makers = [
+    async_sessionmaker(bind=replica_engine, expire_on_commit=False)
+    for replica_engine in replica_engines
+]
+next_replica = itertools.cycle(range(len(replica_session_makers)))
+
+
+def replica_session_maker() -> async_sessionmaker:
+    if not replica_session_makers:
+        return async_session_maker
+    return replica_session_makers[next(next_replica)]
+
+
+async def warm_up_pool(connections: int) -> int:
+    # More than pool_size would open overflow connections that are closed right away
+    connections = min(connections, settings.DB_POOL_SIZE)
+    # Opened together, otherwise the first connection is just reused
+    opened = await asyncio.gather(
+        *(
+            pool_engine.connect()
+            for pool_engine in [engine, *replica_engines]
+            for _ in range(connections)
+        )
+    )
+    await asyncio.gather(*(connection.close() for connection in opened))
+    return connections
+
+
+async def dispose_engines():
+    await asyncio.gather(*(pool_engine.dispose() for pool_engine in [engine, *replica_engines]))
+
+
+def pool_stats() -> dict[str, float]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        **pool.wait_stats(),
+    }
+
+
+class QueryStats:
+    """SQL statements run and time spent in the database, also added to the parent."""
+
+    def __init__(self, parent: "QueryStats | None" = None):
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+
+    def record(self, seconds: float):
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.seconds += seconds
+            stats = stats.parent
+
+
+# Set per request by RequestMiddleware
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"]
+    DB_QUERY_DURATION.observe(elapsed)
+    record_slow_query(conn, statement, parameters, executemany, elapsed)
+    stats = query_stats.get()
+    if stats is not None:
+        stats.record(elapsed)
+
 
 class Base(DeclarativeBase):
     pass
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import Date, cast, delete, exists, func, insert, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session_maker_null_pool
+from app.models import BookingsOrm, RoomInventoryOrm, RoomsOrm
+
+one_day = literal_column("interval '1 day'")
+
+
+def stay_nights(date_from: date, date_to: date) -> tuple[date, date]:
+    # The check-out day is not a night, a same-day search still looks at one night
+    return date_from, max(date_from, date_to - timedelta(days=1))
+
+
+def room_is_full(date_from: date, date_to: date):
+    first_night, last_night = stay_nights(date_from, date_to)
+    return exists().where(
+        RoomInventoryOrm.room_id == RoomsOrm.id,
+        RoomInventoryOrm.night.between(first_night, last_night),
+        RoomInventoryOrm.booked >= RoomsOrm.quantity,
+    )
+
+
+async def get_max_booked(db: AsyncSession, room_id: int, date_from: date, date_to: date) -> int:
+    first_night, last_night = stay_nights(date_from, date_to)
+    booked = await db.scalar(
+        select(func.max(RoomInventoryOrm.booked)).where(
+            RoomInventoryOrm.room_id == room_id,
+            RoomInventoryOrm.night.between(first_night, last_night),
+        )
+    )
+    return booked or 0
+
+
+async def reserve_nights(db: AsyncSession, room_id: int, date_from: date, date_to: date):
+    nights = [
+        {"room_id": room_id, "night": date_from + timedelta(days=i), "booked": 1}
+        for i in range((date_to - date_from).days)
+    ]
+    if not nights:
+        return
+    query = pg_insert(RoomInventoryOrm).values(nights)
+    await db.execute(
+        query.on_conflict_do_update(
+            index_elements=[RoomInventoryOrm.room_id, RoomInventoryOrm.night],
+            set_={"booked": RoomInventoryOrm.booked + 1},
+        )
+    )
+
+
+async def backfill_inventory(db: AsyncSession):
+    # Block new bookings until the inventory is rebuilt
+    await db.execute(text("LOCK TABLE bookings IN SHARE MODE"))
+    await db.execute(delete(RoomInventoryOrm))
+    nights = select(
+        BookingsOrm.room_id,
+        cast(
+            func.generate_series(BookingsOrm.date_from, BookingsOrm.date_to - one_day, one_day),
+            Date,
+        ).label("night"),
+    ).subquery()
+    await db.execute(
+        insert(RoomInventoryOrm).from_select(
+            ["room_id", "night", "booked"],
+            select(nights.c.room_id, nights.c.night, func.count()).group_by(
+                nights.c.room_id, nights.c.night
+            ),
+        )
+    )
+
+
+async def main():
+    async with async_session_maker_null_pool() as session:
+        await backfill_inventory(session)
+        await session.commit()
+    logging.info("Инвентарь номеров пересчитан по бронированиям")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,14 +1,23 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 import logging
 
 from fastapi import FastAPI
-from app.routers import hotels, rooms, auth, bookings, facilities, images
+from app.routers import hotels, rooms, auth, bookings, facilities, images, catalogue, metrics, admin
 
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from redis import asyncio as aioredis
+from app.cache import cache_stats, init_cache, listen_invalidations
 from app.config import settings
+from app.database import (
+    dispose_engines,
+    pool_stats,
+    replica_session_makers,
+    warm_up_pool,
+)
+from app.metrics import mark_process_dead
+from app.middleware import ProfileMiddleware, RequestMiddleware
+from app.watchdog import LoopWatchdog
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -18,16 +27,43 @@ async def lifespan(app: FastAPI):
     logging.info(f"Начинаю подключение к Redis {settings.REDIS_URL}")
     redis = aioredis.from_url(settings.REDIS_URL)
     logging.info(f"Успешное подключение к Redis {settings.REDIS_URL}")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    init_cache(redis)
+    listener = asyncio.create_task(listen_invalidations())
     logging.info("FastAPI cache initialized")
+    opened = await warm_up_pool(settings.DB_POOL_WARMUP)
+    logging.info(f"Открыто {opened} соединений с базой данных")
+    watchdog = None
+    if settings.LOOP_LAG_THRESHOLD:
+        watchdog = LoopWatchdog(settings.LOOP_LAG_THRESHOLD)
+        watchdog.start()
     yield
+    if watchdog is not None:
+        watchdog.stop()
+        logging.info(f"Задержка цикла событий: {watchdog.percentiles()}")
+    listener.cancel()
+    logging.info(f"Статистика кэша: {cache_stats()}")
+    logging.info(f"Статистика пула соединений: {pool_stats()}")
+    await dispose_engines()
+    mark_process_dead()
 
 
 app = FastAPI(lifespan=lifespan)
 
+
+app.add_middleware(RequestMiddleware, read_your_writes=bool(replica_session_makers))
+
+
+# Not even the header check runs without an admin token
+if settings.ADMIN_TOKEN:
+    app.add_middleware(ProfileMiddleware)
+
+
 app.include_router(auth.router)
 app.include_router(hotels.router)
 app.include_router(rooms.router)
 app.include_router(bookings.router)
 app.include_router(facilities.router)
 app.include_router(images.router)
+app.include_router(catalogue.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import re
+import uuid
+
+import anyio
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, UnidentifiedImageError
+
+from app.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+IMAGE_FORMATS = {"JPEG", "PNG", "WEBP"}
+IMAGE_NAME = re.compile(r"[0-9a-f]{64}\.(jpeg|png|webp)")
+
+# Widths of the resized copies, largest first: each one is made from the previous
+RESIZE_SIZES = [1000, 500, 200]
+WEBP_QUALITY = 80
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_upload_bytes() -> int:
+    # Boundaries and part headers come on top of the files
+    return settings.MAX_IMAGE_BYTES * settings.MAX_IMAGES_PER_UPLOAD + MULTIPART_OVERHEAD
+
+
+def media_path(name: str) -> anyio.Path:
+    return anyio.Path(settings.MEDIA_DIR) / name
+
+
+def read_image_info(path: str) -> tuple[str, int, int]:
+    # Only the header is read, the pixels are not decoded
+    with Image.open(path) as img:
+        return img.format, img.width, img.height
+
+
+def too_many_pixels(filename: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"{filename}: more than {settings.MAX_IMAGE_PIXELS} pixels",
+    )
+
+
+async def check_image(path: anyio.Path, filename: str) -> str:
+    try:
+        format, width, height = await anyio.to_thread.run_sync(read_image_info, str(path))
+    except Image.DecompressionBombError:
+        raise too_many_pixels(filename)
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        # Also a truncated or broken header
+        format, width, height = None, 0, 0
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{filename}: expected one of {sorted(IMAGE_FORMATS)}",
+        )
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise too_many_pixels(filename)
+    return format
+
+
+async def receive_image(file: UploadFile) -> tuple[anyio.Path, str]:
+    """Writes the upload to a temporary file in MEDIA_DIR and checks that it is an image.
+
+    Returns the file and the name it is stored under, the caller removes the file.
+    """
+    media_dir = anyio.Path(settings.MEDIA_DIR)
+    await media_dir.mkdir(parents=True, exist_ok=True)
+    upload_path = media_dir / f".upload-{uuid.uuid4().hex}"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(upload_path, "wb") as upload:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.MAX_IMAGE_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"{file.filename}: more than {settings.MAX_IMAGE_BYTES} bytes",
+                    )
+                digest.update(chunk)
+                await upload.write(chunk)
+        format = await check_image(upload_path, file.filename)
+    except BaseException:
+        await upload_path.unlink(missing_ok=True)
+        raise
+    return upload_path, f"{digest.hexdigest()}.{format.lower()}"
+
+
+async def link_image(upload_path: anyio.Path, name: str) -> bool:
+    """Stores the received file under its name, returns False if the content is already there."""
+    try:
+        # Fails if the same content is already stored, also for concurrent uploads
+        await media_path(name).hardlink_to(upload_path)
+    except FileExistsError:
+        return False
+    return True
+
+
+def variant_path(image_path: str, size: int, ext: str) -> str:
+    name, _ = os.path.splitext(image_path)
+    return f"{name}_{size}px{ext}"
+
+
+def make_variants(image_path: str, sizes: list[int] = RESIZE_SIZES) -> list[str]:
+    """Writes the resized copies of the image next to it, returns their paths."""
+    _, ext = os.path.splitext(image_path)
+    paths = []
+    with Image.open(image_path) as img:
+        if img.width * img.height > settings.MAX_IMAGE_PIXELS:
+            raise Image.DecompressionBombError(f"{image_path}: {img.width}x{img.height}")
+        width, height = img.size
+        # JPEG is decoded straight at 1/2..1/8 of the size, still above the largest copy
+        img.draft("RGB", (sizes[0], sizes[0] * height // width))
+        resized = img
+        for size in sizes:
+            # Small originals are not upscaled
+            if size < resized.width:
+                # Heights follow the original, rounding does not add up down the cascade
+                new_height = max(1, round(height * size / width))
+                resized = resized.resize((size, new_height), Image.Resampling.LANCZOS)
+            paths.append(variant_path(image_path, size, ext))
+            resized.save(paths[-1])
+            if settings.RESIZE_WEBP and ext != ".webp":
+                paths.append(variant_path(image_path, size, ".webp"))
+                if resized.mode not in ("RGB", "RGBA"):
+                    resized = resized.convert("RGBA" if resized.has_transparency_data else "RGB")
+                resized.save(paths[-1], quality=WEBP_QUALITY, method=4)
+    return paths
+
+
+async def select_variant(name: str, width: int | None, webp: bool) -> tuple[anyio.Path, bool]:
+    """Picks the smallest copy at least `width` wide, WebP first if the client takes it.
+
+    Also returns False if the right copy is not resized yet and a bigger one is served instead.
+    """
+    original = str(media_path(name))
+    _, ext = os.path.splitext(original)
+    exts = [".webp", ext] if webp and ext != ".webp" else [ext]
+    ready = True
+    for size in sorted(RESIZE_SIZES):
+        if width is None or size < width:
+            continue
+        for variant_ext in exts:
+            path = anyio.Path(variant_path(original, size, variant_ext))
+            if await path.exists():
+                return path, ready
+        ready = False
+    return anyio.Path(original), ready
@@ -0,0 +1,91 @@
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from prometheus_client import generate_latest, start_http_server
+
+# With PROMETHEUS_MULTIPROC_DIR set every process writes its samples into mmapped files
+# there, a scrape of any of them adds them up. The files are named by pid: one directory
+# per container (pids repeat across them), emptied before the processes start.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+CELERY_QUEUE = "celery"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to the response headers", ["method", "route"]
+)
+REQUESTS = Counter("http_requests", "Finished requests", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time of a single SQL statement",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from the pool",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_OPEN = Gauge(
+    "db_pool_connections_open", "Connections held by the pools", multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out", "Connections in use", multiprocess_mode="livesum"
+)
+
+CACHE_EVENTS = Counter(
+    "cache_events", "Cache lookups: local_hits, redis_hits, misses, coalesced", ["event"]
+)
+
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Run time of a celery task",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+QUEUE_LENGTH = Gauge(
+    "celery_queue_length",
+    "Messages waiting in the broker",
+    ["queue"],
+    multiprocess_mode="mostrecent",
+)
+
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late a sleeping task wakes up, sampled by the loop watchdog",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+LOOP_STALLS = Counter("event_loop_stalls", "Event loop blocked longer than the threshold")
+
+
+def route_path(scope: dict) -> str:
+    # Put into the scope by the router, the template keeps the label set bounded
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def registry() -> CollectorRegistry:
+    if not MULTIPROCESS:
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+def render() -> bytes:
+    return generate_latest(registry())
+
+
+def start_metrics_server(port: int):
+    # For the celery worker, it has no HTTP server of its own
+    start_http_server(port, registry=registry())
+
+
+def mark_process_dead():
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,121 @@
+import math
+import threading
+import time
+from http.cookies import SimpleCookie
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.database import QueryStats, query_stats
+from app.metrics import REQUEST_DURATION, REQUESTS, REQUESTS_IN_PROGRESS, route_path
+from app.profiler import Sampler, profiling
+from app.routers.dependencies import ADMIN_TOKEN_HEADER, READ_PRIMARY_COOKIE, is_admin_token
+from app.slow_queries import current_request
+
+
+def read_primary_cookie() -> str:
+    cookie = SimpleCookie()
+    cookie[READ_PRIMARY_COOKIE] = "1"
+    cookie[READ_PRIMARY_COOKIE]["max-age"] = math.ceil(settings.DB_REPLICA_MAX_LAG)
+    cookie[READ_PRIMARY_COOKIE]["path"] = "/"
+    cookie[READ_PRIMARY_COOKIE]["httponly"] = True
+    cookie[READ_PRIMARY_COOKIE]["samesite"] = "lax"
+    return cookie.output(header="").strip()
+
+
+class RequestMiddleware:
+    """Metrics, query counts and the read-your-writes cookie of every HTTP request.
+
+    A plain ASGI middleware: the route is the one the router put into the scope, the
+    context variables set here are seen by the endpoint.
+    """
+
+    def __init__(self, app: ASGIApp, read_your_writes: bool = False):
+        self.app = app
+        # Only with replicas, otherwise every read goes to the primary anyway
+        self.read_your_writes = read_your_writes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        # The route is not known before the router ran
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        stats = QueryStats(parent=query_stats.get())
+        stats_token = query_stats.set(stats)
+        request_token = current_request.set(scope)
+        started = time.perf_counter()
+        headers_sent = None
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal headers_sent, status_code
+            if message["type"] == "http.response.start":
+                headers_sent = time.perf_counter()
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                if settings.DEBUG:
+                    headers["X-DB-Queries"] = str(stats.count)
+                    headers["X-DB-Time"] = f"{stats.seconds * 1000:.1f}ms"
+                if (
+                    self.read_your_writes
+                    and method not in ("GET", "HEAD", "OPTIONS")
+                    and status_code < 400
+                ):
+                    headers.append("set-cookie", read_primary_cookie())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(request_token)
+            query_stats.reset(stats_token)
+            in_progress.dec()
+            route = route_path(scope)
+            REQUEST_DURATION.labels(method, route).observe(
+                (headers_sent or time.perf_counter()) - started
+            )
+            REQUESTS.labels(method, route, status_code).inc()
+
+
+class ProfileMiddleware:
+    """With "X-Profile: 1" and the admin token the response is the profile of the request.
+
+    Only the event loop thread is sampled, concurrent requests show up in it too.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        if "x-profile" not in headers or not is_admin_token(headers.get(ADMIN_TOKEN_HEADER)):
+            return await self.app(scope, receive, send)
+        if profiling.locked():
+            response = PlainTextResponse("already profiling", status_code=409)
+            return await response(scope, receive, send)
+
+        status_code = 500
+
+        async def discard(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        async with profiling:
+            sampler = Sampler({threading.get_ident()})
+            sampler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                await sampler.stop()
+        response = PlainTextResponse(
+            sampler.collapsed(), headers={"X-Profiled-Status": str(status_code)}
+        )
+        await response(scope, receive, send)
@@ -14,6 +14,7 @@ from app.models import (
     rooms_facilities,  # noqa: F401
     FacilitiesOrm,  # noqa: F401
     BookingsOrm,  # noqa: F401
+    RoomInventoryOrm,  # noqa: F401
     UsersOrm,  # noqa: F401
     RoomsOrm,  # noqa: F401
     HotelsOrm,  # noqa: F401
@@ -0,0 +1,48 @@
+"""room inventory
+
+Revision ID: 06ce8c0de908
+Revises: dd3640e19269
+Create Date: 2026-10-18 10:12:41.512733
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "06ce8c0de908"
+down_revision: Union[str, None] = "dd3640e19269"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "room_inventory",
+        sa.Column("room_id", sa.Integer(), nullable=False),
+        sa.Column("night", sa.Date(), nullable=False),
+        sa.Column("booked", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["room_id"],
+            ["rooms.id"],
+        ),
+        sa.PrimaryKeyConstraint("room_id", "night"),
+    )
+    # Fill the table from the bookings that already exist
+    op.execute(
+        """
+        INSERT INTO room_inventory (room_id, night, booked)
+        SELECT bookings.room_id, nights.night::date, count(*)
+        FROM bookings,
+            generate_series(bookings.date_from, bookings.date_to - 1, interval '1 day')
+            AS nights(night)
+        GROUP BY bookings.room_id, nights.night
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("room_inventory")
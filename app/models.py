@@ -1,14 +1,17 @@
-from sqlalchemy import Table, Column, ForeignKey, String
+from sqlalchemy import DDL, Table, Column, ForeignKey, Index, String, event, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
-from datetime import date
+from datetime import date, datetime
 
+# Trigram indexes on hotels need the extension before the tables are created
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
 rooms_facilities = Table(
     "rooms_facilities",
     Base.metadata,
     Column("room_id", ForeignKey("rooms.id"), primary_key=True),
     Column("facility_id", ForeignKey("facilities.id"), primary_key=True),
+    Index("ix_rooms_facilities_facility_id", "facility_id"),
 )
 
 
@@ -26,13 +29,32 @@ class FacilitiesOrm(Base):
 
 class BookingsOrm(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        Index("ix_bookings_room_id_date_from_date_to", "room_id", "date_from", "date_to"),
+        # Check-in notifications walk the day's bookings that were not notified yet by id
+        Index(
+            "ix_bookings_checkin_pending",
+            "date_from",
+            "id",
+            postgresql_where=text("checkin_notified_at IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     room_id: Mapped[int] = mapped_column(ForeignKey("rooms.id"))
-    date_from: Mapped[date]
+    date_from: Mapped[date] = mapped_column(index=True)
     date_to: Mapped[date]
     price: Mapped[int]
+    checkin_notified_at: Mapped[datetime | None] = mapped_column(default=None)
+
+
+class RoomInventoryOrm(Base):
+    __tablename__ = "room_inventory"
+
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.id"), primary_key=True)
+    night: Mapped[date] = mapped_column(primary_key=True)
+    booked: Mapped[int] = mapped_column(default=0)
 
 
 class UsersOrm(Base):
@@ -48,7 +70,7 @@ class RoomsOrm(Base):
     __tablename__ = "rooms"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    hotel_id: Mapped[int] = mapped_column(ForeignKey("hotels.id"))
+    hotel_id: Mapped[int] = mapped_column(ForeignKey("hotels.id"), index=True)
     title: Mapped[str]
     description: Mapped[str | None]
     price: Mapped[int]
@@ -62,6 +84,20 @@ class RoomsOrm(Base):
 
 class HotelsOrm(Base):
     __tablename__ = "hotels"
+    __table_args__ = (
+        Index(
+            "ix_hotels_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_hotels_location_trgm",
+            "location",
+            postgresql_using="gin",
+            postgresql_ops={"location": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(100))
@@ -0,0 +1,82 @@
+import json
+import logging
+import time
+from collections import Counter
+from datetime import date
+
+import anyio
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import BookingsOrm, UsersOrm
+
+NOTIFY_BATCH_SIZE = 500
+
+stats = Counter()
+
+
+class FileSender:
+    """Stand-in for an SMTP relay, appends the letters to an NDJSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def send(self, letters: list[dict]):
+        lines = "".join(
+            json.dumps(letter, default=str, ensure_ascii=False) + "\n" for letter in letters
+        )
+        async with await anyio.open_file(self.path, "a") as file:
+            await file.write(lines)
+
+
+def checkin_batch(day: date, limit: int = NOTIFY_BATCH_SIZE):
+    # Another run of the task skips the rows this one is sending
+    return (
+        select(
+            BookingsOrm.id,
+            UsersOrm.email,
+            BookingsOrm.room_id,
+            BookingsOrm.date_from,
+            BookingsOrm.date_to,
+        )
+        .join(UsersOrm, UsersOrm.id == BookingsOrm.user_id)
+        .where(BookingsOrm.date_from == day, BookingsOrm.checkin_notified_at.is_(None))
+        .order_by(BookingsOrm.id)
+        .limit(limit)
+        .with_for_update(of=BookingsOrm, skip_locked=True)
+    )
+
+
+async def notify_checkins(
+    db: AsyncSession, sender, day: date, batch_size: int = NOTIFY_BATCH_SIZE
+) -> int:
+    """Sends the bookings with check-in on `day` that were not notified yet, returns their count.
+
+    Every booking is marked on its own, one committed late under a lower id is sent by the next run.
+    """
+    sent = 0
+    while True:
+        started = time.perf_counter()
+        letters = (await db.execute(checkin_batch(day, batch_size))).mappings().all()
+        if not letters:
+            await db.rollback()
+            break
+        await sender.send([dict(letter) for letter in letters])
+        await db.execute(
+            update(BookingsOrm)
+            .where(BookingsOrm.id.in_([letter["id"] for letter in letters]))
+            .values(checkin_notified_at=func.now())
+        )
+        await db.commit()
+
+        sent += len(letters)
+        stats["batches"] += 1
+        stats["letters"] += len(letters)
+        elapsed = (time.perf_counter() - started) * 1000
+        logging.info(
+            f"Отправлено {len(letters)} уведомлений о заезде {day} за {elapsed:.0f} мс, "
+            f"последняя бронь {letters[-1]['id']}"
+        )
+        if len(letters) < batch_size:
+            break
+    return sent
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+
+import anyio
+
+# ~200 samples a second, the interpreter hands over the GIL every 5ms anyway
+SAMPLE_INTERVAL = 0.005
+MAX_PROFILE_SECONDS = 60
+
+# One profile per worker at a time, samples of two would mix
+profiling = asyncio.Lock()
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if "site-packages" in path:
+        path = path.rsplit("site-packages" + os.sep, 1)[-1]
+    else:
+        path = os.path.relpath(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def fold(frame) -> list[str]:
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class Sampler:
+    """Samples the stacks of the given threads, all by default, from a background thread.
+
+    Nothing runs outside of start()..stop(). The result is in the collapsed format of
+    flamegraph.pl and speedscope: one "thread;outer;...;inner count" line per stack.
+    """
+
+    def __init__(self, thread_ids: set[int] | None = None, interval: float = SAMPLE_INTERVAL):
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    async def stop(self):
+        self.stopped.set()
+        # The last sample may still be running, the event loop does not wait for it
+        await anyio.to_thread.run_sync(self.thread.join)
+
+    def run(self):
+        threads = {}
+        while not self.stopped.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.thread.ident or (
+                    self.thread_ids is not None and thread_id not in self.thread_ids
+                ):
+                    continue
+                if thread_id not in threads:
+                    threads = {thread.ident: thread.name for thread in threading.enumerate()}
+                name = threads.get(thread_id, str(thread_id))
+                self.stacks[";".join([name, *fold(frame)])] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
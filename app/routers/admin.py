@@ -0,0 +1,34 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.profiler import MAX_PROFILE_SECONDS, Sampler, profiling
+from app.routers.dependencies import check_admin_token
+from app.schemas.admin import SlowQueryOut
+from app.slow_queries import slow_queries
+
+router = APIRouter(
+    prefix="/admin", tags=["Администрирование"], dependencies=[Depends(check_admin_token)]
+)
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS)):
+    """Samples every thread of this worker for the given time, returns collapsed stacks."""
+    if profiling.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="already profiling")
+    async with profiling:
+        sampler = Sampler()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await sampler.stop()
+    return sampler.collapsed()
+
+
+@router.get("/slow-queries", response_model=list[SlowQueryOut])
+async def get_slow_queries():
+    """The last statements over SLOW_QUERY_SECONDS, newest first, with a plan for some."""
+    return list(reversed(slow_queries))
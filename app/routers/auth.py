@@ -8,7 +8,8 @@ from app.routers.dependencies import (
 )
 from app.schemas.users import UserIn, UserOut
 from app.models import UsersOrm
-from sqlalchemy import insert, select
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 
 router = APIRouter(prefix="/auth", tags=["users"])
 
@@ -18,12 +19,19 @@ async def register_user(user_in: UserIn, db: db):
     user = await db.scalar(select(UsersOrm).where(UsersOrm.email == user_in.email))
     if user:
         raise HTTPException(status_code=409, detail="user already exists")
-    user = await db.scalar(
-        insert(UsersOrm)
-        .values(email=user_in.email, hashed_password=hash_password(user_in.password))
-        .returning(UsersOrm)
-    )
-    await db.commit()
+    await db.rollback()
+    hashed_password = await hash_password(user_in.password)
+    try:
+        user = await db.scalar(
+            insert(UsersOrm)
+            .values(email=user_in.email, hashed_password=hashed_password)
+            .returning(UsersOrm)
+        )
+        await db.commit()
+    except IntegrityError:
+        # Registered by a concurrent request while the password was being hashed
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="user already exists")
     return user
 
 
@@ -32,9 +40,18 @@ async def login_user(user_in: UserIn, response: Response, db: db):
     user = await db.scalar(select(UsersOrm).where(UsersOrm.email == user_in.email))
     if not user:
         raise HTTPException(status_code=401, detail="Пользователь с таким email не зарегистрирован")
-    if not verify_password(user_in.password, user.hashed_password):
+    user_id, hashed_password = user.id, user.hashed_password
+    # Give the connection back to the pool while the password is being checked
+    await db.rollback()
+    valid, new_hash = await verify_password(user_in.password, hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Пароль неверный")
-    access_token = create_access_token({"user_id": user.id})
+    if new_hash:
+        await db.execute(
+            update(UsersOrm).where(UsersOrm.id == user_id).values(hashed_password=new_hash)
+        )
+        await db.commit()
+    access_token = create_access_token({"user_id": user_id})
     response.set_cookie("access_token", access_token)
     return {"access_token": access_token}
 
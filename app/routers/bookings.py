@@ -1,56 +1,131 @@
-from fastapi import APIRouter, HTTPException, status
-from sqlalchemy import select, insert, func, or_, and_
+import csv
+import io
+import json
+
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert
+from app.cache import invalidate
+from app.inventory import get_max_booked, reserve_nights
 from app.models import BookingsOrm, RoomsOrm
-from app.routers.dependencies import user_id, db
+from app.routers.dependencies import (
+    PaginationParams,
+    user_id,
+    db,
+    read_db,
+    export_filter,
+    pagination,
+    session_maker,
+    decode_cursor,
+    set_next_cursor,
+)
 from app.schemas.bookings import BookingIn, BookingOut
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
 
+def paginate(query, pagination: PaginationParams):
+    query = query.order_by(BookingsOrm.id).offset(pagination.offset).limit(pagination.limit)
+    if pagination.after:
+        query = query.where(BookingsOrm.id > decode_cursor(pagination.after))
+    return query
+
+
 @router.get("/", response_model=list[BookingOut])
-async def get_bookings(db: db):
-    bookings = await db.scalars(select(BookingsOrm))
+async def get_bookings(db: read_db, pagination: pagination, response: Response):
+    bookings = (await db.scalars(paginate(select(BookingsOrm), pagination))).all()
+    set_next_cursor(response, bookings, pagination.limit)
     return bookings
 
 
 @router.get("/me", response_model=list[BookingOut])
-async def get_my_bookings(user_id: user_id, db: db):
-    bookings = await db.scalars(select(BookingsOrm).where(BookingsOrm.user_id == user_id))
+async def get_my_bookings(
+    user_id: user_id, db: read_db, pagination: pagination, response: Response
+):
+    query = select(BookingsOrm).where(BookingsOrm.user_id == user_id)
+    bookings = (await db.scalars(paginate(query, pagination))).all()
+    set_next_cursor(response, bookings, pagination.limit)
     return bookings
 
 
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = [
+    BookingsOrm.id,
+    BookingsOrm.user_id,
+    BookingsOrm.room_id,
+    BookingsOrm.date_from,
+    BookingsOrm.date_to,
+    BookingsOrm.price,
+]
+
+
+def encode_ndjson(rows) -> str:
+    return "".join(json.dumps(row._asdict(), default=str) + "\n" for row in rows)
+
+
+def encode_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow([column.key for column in EXPORT_COLUMNS])
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+@router.get("/export")
+async def export_bookings(filter: export_filter, session_maker: session_maker):
+    query = select(*EXPORT_COLUMNS).order_by(BookingsOrm.id)
+    if filter.hotel_id is not None:
+        query = query.join(RoomsOrm, RoomsOrm.id == BookingsOrm.room_id).where(
+            RoomsOrm.hotel_id == filter.hotel_id
+        )
+    if filter.date_from:
+        query = query.where(BookingsOrm.date_to > filter.date_from)
+    if filter.date_to:
+        query = query.where(BookingsOrm.date_from < filter.date_to)
+
+    async def content():
+        if filter.format == "csv":
+            yield encode_csv([], header=True)
+        async with session_maker() as session:
+            # Server-side cursor, only one batch of rows is held in memory
+            result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield encode_csv(rows) if filter.format == "csv" else encode_ndjson(rows)
+
+    if filter.format == "csv":
+        return StreamingResponse(
+            content(),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="bookings.csv"'},
+        )
+    return StreamingResponse(content(), media_type="application/x-ndjson")
+
+
 @router.post("/")
 async def add_booking(user_id: user_id, db: db, booking_in: BookingIn):
+    if booking_in.date_from >= booking_in.date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The 'date_from' must be earlier than 'date_to'.",
+        )
     room_id = booking_in.room_id
-    room = await db.scalar(select(RoomsOrm).where(RoomsOrm.id == room_id))
+    # Bookings of the same room wait for each other until commit, so the
+    # availability check below cannot be passed by two requests at once
+    room = await db.scalar(select(RoomsOrm).where(RoomsOrm.id == room_id).with_for_update())
     if room is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="room not found")
-    query = (
-        select(func.count())
-        .select_from(BookingsOrm)
-        .where(
-            BookingsOrm.room_id == room_id,
-            or_(
-                and_(
-                    BookingsOrm.date_from >= booking_in.date_from,
-                    BookingsOrm.date_from <= booking_in.date_to,
-                ),
-                and_(
-                    BookingsOrm.date_to >= booking_in.date_from,
-                    BookingsOrm.date_to <= booking_in.date_to,
-                ),
-            ),
-        )
-    )
-    result = await db.execute(query)
-    if result.scalar() < room.quantity:
+    booked = await get_max_booked(db, room_id, booking_in.date_from, booking_in.date_to)
+    if booked < room.quantity:
         total_price = room.price * (booking_in.date_to - booking_in.date_from).days
         await db.scalar(
             insert(BookingsOrm)
             .values(user_id=user_id, price=total_price, **booking_in.model_dump())
             .returning(BookingsOrm)
         )
+        await reserve_nights(db, room_id, booking_in.date_from, booking_in.date_to)
         await db.commit()
+        await invalidate("availability", f"hotel:{room.hotel_id}")
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No available rooms")
     return {"status": "ok"}
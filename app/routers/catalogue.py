@@ -0,0 +1,54 @@
+import codecs
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+
+from app.cache import invalidate
+from app.catalogue import file_format, import_catalogue, read_rows
+from app.routers.dependencies import check_admin_token, db
+from app.schemas.catalogue import ImportResult
+
+router = APIRouter(prefix="/catalogue", tags=["Каталог"], dependencies=[Depends(check_admin_token)])
+
+
+def decode_lines(name: str, upload: UploadFile) -> Iterator[str]:
+    # Lines of the spooled file, TextIOWrapper needs more of it than Python 3.10 has
+    try:
+        yield from codecs.iterdecode(upload.file, "utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} ({upload.filename}) is not a UTF-8 file",
+        )
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_catalogue_files(
+    db: db,
+    hotels: UploadFile | None = None,
+    rooms: UploadFile | None = None,
+    rooms_facilities: UploadFile | None = None,
+):
+    sources = {}
+    for name, upload in (
+        ("hotels", hotels),
+        ("rooms", rooms),
+        ("rooms_facilities", rooms_facilities),
+    ):
+        if upload is not None:
+            sources[name] = read_rows(decode_lines(name, upload), file_format(upload.filename))
+
+    try:
+        result, errors = await import_catalogue(db, **sources)
+    except HTTPException:
+        await db.rollback()
+        raise
+    if errors:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=[error.model_dump() for error in errors],
+        )
+    await db.commit()
+    await invalidate("catalogue")
+    return result
@@ -1,35 +1,134 @@
-from fastapi import Depends, Query, Request, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Annotated
+import asyncio
+import base64
+import json
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import Depends, Header, Query, Request, Response, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import Annotated, Literal
 from pydantic import BaseModel, Field
-from app.database import async_session_maker
+from app.database import async_session_maker, replica_session_maker
 import jwt
 from app.config import settings
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone, date
 
 
-class FilterParams(BaseModel):
+class PaginationParams(BaseModel):
     limit: int = Field(100, gt=0, le=100)
     offset: int = Field(0, ge=0)
+    after: str | None = None
+
+
+class FilterParams(PaginationParams):
     location: str | None = None
     title: str | None = None
+    q: str | None = None
+    date_from: date | None = None
+    date_to: date | None = None
+
+
+class RoomFilterParams(PaginationParams):
+    date_from: date = Field(examples=["2024-09-08"])
+    date_to: date = Field(examples=["2024-09-20"])
+
+
+class CalendarParams(BaseModel):
+    date_from: date = Field(examples=["2024-09-01"])
+    date_to: date = Field(examples=["2024-10-01"])
+
+
+class BookingExportParams(BaseModel):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    hotel_id: int | None = None
     date_from: date | None = None
     date_to: date | None = None
 
 
+pagination = Annotated[PaginationParams, Query()]
 filter = Annotated[FilterParams, Query()]
+room_filter = Annotated[RoomFilterParams, Query()]
+calendar_filter = Annotated[CalendarParams, Query()]
+export_filter = Annotated[BookingExportParams, Query()]
+
+
+def encode_cursor(id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": id}).encode()).decode()
+
+
+# Ids are int4, a larger one fails when the query binds it
+MAX_CURSOR_ID = 2**31 - 1
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        id = int(json.loads(base64.urlsafe_b64decode(cursor))["id"])
+    except (ValueError, TypeError, KeyError, OverflowError):
+        id = None
+    if id is None or not 0 <= id <= MAX_CURSOR_ID:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return id
+
+
+def set_next_cursor(response: Response, items: list, limit: int):
+    if len(items) == limit:
+        last = items[-1]
+        last_id = last["id"] if isinstance(last, dict) else last.id
+        response.headers["X-Next-Cursor"] = encode_cursor(last_id)
 
 
 async def get_db():
+    # The session checks out a connection on its first query, cache hits never touch the pool
     async with async_session_maker() as session:
         yield session
 
 
 db = Annotated[AsyncSession, Depends(get_db)]
 
+# Set after a write by RequestMiddleware when there are replicas
+READ_PRIMARY_COOKIE = "read_primary"
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def get_read_session_maker(request: Request):
+    # Replicas may not have the user's own write yet
+    if request.cookies.get(READ_PRIMARY_COOKIE):
+        return async_session_maker
+    return replica_session_maker()
+
+
+async def get_read_db(
+    session_maker: Annotated[async_sessionmaker, Depends(get_read_session_maker)],
+):
+    async with session_maker() as session:
+        yield session
+
+
+read_db = Annotated[AsyncSession, Depends(get_read_db)]
+
+
+# Streaming responses outlive the request dependencies and open their own session
+def get_session_maker():
+    return async_session_maker
+
+
+session_maker = Annotated[async_sessionmaker, Depends(get_session_maker)]
+
+
+# Hashes with another cost are rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, hashing in threads keeps the event loop free
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+password_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
 
 
 def create_access_token(data: dict) -> str:
@@ -40,12 +139,24 @@ def create_access_token(data: dict) -> str:
     return encoded_jwt
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def run_password_task(func, *args):
+    if password_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Слишком много запросов авторизации, попробуйте позже",
+            headers={"Retry-After": "1"},
+        )
+    async with password_slots:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+
 
+async def hash_password(password: str) -> str:
+    return await run_password_task(pwd_context.hash, password)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+
+async def verify_password(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """Returns whether the password matches and a new hash if the stored one is outdated."""
+    return await run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def encode_token(token: str) -> dict:
@@ -70,3 +181,17 @@ def get_current_user_id(token: Annotated[str, Depends(get_token)]):
 
 
 user_id = Annotated[int, Depends(get_current_user_id)]
+
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def is_admin_token(token: str | None) -> bool:
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+def check_admin_token(x_admin_token: Annotated[str | None, Header()] = None):
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="admin token required")
@@ -1,16 +1,17 @@
 from fastapi import APIRouter
 from sqlalchemy import select, insert
 from app.schemas.facilities import FacilityIn, FacilityOut
-from app.routers.dependencies import db
+from app.routers.dependencies import db, read_db
 from app.models import FacilitiesOrm
 from fastapi_cache.decorator import cache
+from app.cache import CACHE_EXPIRE, invalidate, versioned_key
 
 router = APIRouter(prefix="/facilities", tags=["Удобства"])
 
 
 @router.get("/", response_model=list[FacilityOut])
-@cache(expire=10)
-async def get_facilities(db: db):
+@cache(expire=CACHE_EXPIRE, key_builder=versioned_key("facilities"))
+async def get_facilities(db: read_db):
     facilities = await db.scalars(select(FacilitiesOrm))
     return [FacilityOut.model_validate(el.__dict__) for el in facilities]
 
@@ -21,6 +22,7 @@ async def create_facility(db: db, facility_in: FacilityIn):
         insert(FacilitiesOrm).values(**facility_in.model_dump()).returning(FacilitiesOrm)
     )
     await db.commit()
+    await invalidate("facilities")
 
     # test_task.delay()
 
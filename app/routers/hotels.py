@@ -1,120 +1,138 @@
-from app.routers.dependencies import filter, db
-from fastapi import APIRouter, status, HTTPException
+from app.routers.dependencies import (
+    FilterParams,
+    filter,
+    db,
+    read_db,
+    decode_cursor,
+    set_next_cursor,
+)
+from fastapi import APIRouter, Response, status, HTTPException
 
 from sqlalchemy import insert, select, func, delete, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.inventory import room_is_full
 from app.schemas.hotels import HotelIn, HotelOut, HotelPatch
-from app.models import HotelsOrm, RoomsOrm, BookingsOrm
+from app.models import HotelsOrm, RoomsOrm
 from fastapi_cache.decorator import cache
+from app.cache import CACHE_EXPIRE, invalidate, single_flight, versioned_key
 
 
 router = APIRouter(prefix="/hotels", tags=["hotels"])
 
+search_key = versioned_key("catalogue", "availability")
+
+
+def contains_pattern(value: str) -> str:
+    escaped = value.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
 
 @router.get("/", response_model=list[HotelOut])
-@cache(expire=10)
-async def get_hotels(filter: filter, db: db):
+async def get_hotels(filter: filter, db: read_db, response: Response):
+    hotels = await search_hotels(filter, db)
+    if not filter.q:
+        set_next_cursor(response, hotels, filter.limit)
+    return hotels
+
+
+# Cached apart from the route so that X-Next-Cursor is also sent on cache hits
+@cache(expire=CACHE_EXPIRE, key_builder=search_key)
+@single_flight(search_key)
+async def search_hotels(filter: FilterParams, db: AsyncSession) -> list[dict]:
     if filter.date_to and filter.date_from:
         if filter.date_from > filter.date_to:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="The 'date_from' must be earlier than 'date_to'.",
             )
-        room_count_subquery = (
-            select(RoomsOrm.hotel_id, func.count().label("room_count"))
-            .group_by(RoomsOrm.hotel_id)
-            .subquery()
-        )
-
-        booked_rooms_subquery = (
-            select(RoomsOrm.hotel_id, func.count().label("booked_rooms"))
-            .where(
-                RoomsOrm.id.in_(
-                    select(BookingsOrm.room_id)
-                    .where(
-                        or_(
-                            BookingsOrm.date_from.between(filter.date_from, filter.date_to),
-                            BookingsOrm.date_to.between(filter.date_from, filter.date_to),
-                        )
-                    )
-                    .group_by(BookingsOrm.room_id)
-                )
-            )
-            .group_by(RoomsOrm.hotel_id)
-            .subquery()
-        )
-
-        query = (
-            select(HotelsOrm)
-            .join(room_count_subquery, HotelsOrm.id == room_count_subquery.c.hotel_id)
-            .outerjoin(booked_rooms_subquery, HotelsOrm.id == booked_rooms_subquery.c.hotel_id)
-            .where(
-                (
-                    room_count_subquery.c.room_count
-                    - func.coalesce(booked_rooms_subquery.c.booked_rooms, 0)
-                )
-                != 0
-            )
+        available_rooms = select(RoomsOrm.hotel_id).where(
+            ~room_is_full(filter.date_from, filter.date_to)
         )
+        query = select(HotelsOrm).where(HotelsOrm.id.in_(available_rooms))
     else:
         query = select(HotelsOrm)
+    # ILIKE and %> are served by the trigram indexes on hotels
     if filter.location:
-        query = query.filter(
-            func.lower(HotelsOrm.location).contains(filter.location.strip().lower())
-        )
+        query = query.filter(HotelsOrm.location.ilike(contains_pattern(filter.location)))
     if filter.title:
-        query = query.filter(func.lower(HotelsOrm.title).contains(filter.title.strip().lower()))
+        query = query.filter(HotelsOrm.title.ilike(contains_pattern(filter.title)))
+    if filter.q:
+        q = filter.q.strip()
+        rank = func.greatest(
+            func.word_similarity(q, HotelsOrm.title), func.word_similarity(q, HotelsOrm.location)
+        )
+        query = query.filter(
+            or_(HotelsOrm.title.op("%>")(q), HotelsOrm.location.op("%>")(q))
+        ).order_by(rank.desc(), HotelsOrm.id)
+        if filter.after:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ranked search 'q' is paginated with 'offset' only.",
+            )
+    else:
+        # Keyset pagination walks the primary key instead of skipping rows
+        query = query.order_by(HotelsOrm.id)
+        if filter.after:
+            query = query.where(HotelsOrm.id > decode_cursor(filter.after))
     query = query.offset(filter.offset).limit(filter.limit)
     hotels = await db.scalars(query, {"date_from": filter.date_from, "date_to": filter.date_to})
-    return [HotelOut.model_validate(el.__dict__) for el in hotels]
+    return [HotelOut.model_validate(el.__dict__).model_dump() for el in hotels]
 
 
 @router.post("/", response_model=HotelOut, status_code=status.HTTP_201_CREATED)
 async def create_hotel(hotel: HotelIn, db: db):
     hotel = await db.scalar(insert(HotelsOrm).values(**hotel.model_dump()).returning(HotelsOrm))
     await db.commit()
+    await invalidate("catalogue")
     return hotel
 
 
 @router.get("/{hotel_id}", response_model=HotelOut)
-async def get_hotel(hotel_id: int, db: db):
+@cache(expire=CACHE_EXPIRE, key_builder=versioned_key("hotel:{hotel_id}"))
+async def get_hotel(hotel_id: int, db: read_db):
     hotel = await db.scalar(select(HotelsOrm).where(HotelsOrm.id == hotel_id))
     if hotel is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
-    return hotel
+    return HotelOut.model_validate(hotel.__dict__)
 
 
 @router.put("/{hotel_id}", response_model=HotelOut)
 async def edit_hotel(hotel_id: int, hotel: HotelIn, db: db):
-    hotel_db = await db.scalar(select(HotelsOrm).where(HotelsOrm.id == hotel_id))
-    if hotel_db is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
     hotel = await db.scalar(
         update(HotelsOrm)
         .where(HotelsOrm.id == hotel_id)
         .values(**hotel.model_dump())
         .returning(HotelsOrm)
     )
+    if hotel is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
     await db.commit()
+    await invalidate("catalogue", f"hotel:{hotel_id}")
     return hotel
 
 
 @router.patch("/{hotel_id}", response_model=HotelOut)
 async def partially_edit_hotel(hotel_id: int, hotel: HotelPatch, db: db):
-    hotel_db = await db.scalar(select(HotelsOrm).where(HotelsOrm.id == hotel_id))
-    if hotel_db is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
     hotel = await db.scalar(
-        update(HotelsOrm).values(**hotel.model_dump(exclude_unset=True)).returning(HotelsOrm)
+        update(HotelsOrm)
+        .where(HotelsOrm.id == hotel_id)
+        .values(**hotel.model_dump(exclude_unset=True))
+        .returning(HotelsOrm)
     )
+    if hotel is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
     await db.commit()
+    await invalidate("catalogue", f"hotel:{hotel_id}")
     return hotel
 
 
 @router.delete("/{hotel_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_hotel(hotel_id: int, db: db):
-    hotel = await db.scalar(select(HotelsOrm).where(HotelsOrm.id == hotel_id))
+    hotel = await db.scalar(
+        delete(HotelsOrm).where(HotelsOrm.id == hotel_id).returning(HotelsOrm.id)
+    )
     if hotel is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
-    await db.execute(delete(HotelsOrm).where(HotelsOrm.id == hotel_id))
     await db.commit()
+    await invalidate("catalogue", f"hotel:{hotel_id}")
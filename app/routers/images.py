@@ -1,16 +1,93 @@
-import shutil
+import mimetypes
 
-from fastapi import APIRouter, UploadFile
+from fastapi import APIRouter, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import FileResponse
+from fastapi.routing import APIRoute
 
+from app.config import settings
+from app.media import (
+    IMAGE_NAME,
+    link_image,
+    max_upload_bytes,
+    media_path,
+    receive_image,
+    select_variant,
+)
+from app.schemas.images import ImageOut
 from app.tasks.tasks import resize_image
 
-router = APIRouter(prefix="/images", tags=["Изображения отелей"])
 
+class UploadLimitRoute(APIRoute):
+    """Rejects a too large upload by its Content-Length, before the body is read and spooled.
 
-@router.post("/")
-def upload_image(file: UploadFile):
-    image_path = f"/home/evalshine/backend/hotelsapi_media/{file.filename}"
-    with open(image_path, "wb+") as new_file:
-        shutil.copyfileobj(file.file, new_file)
+    The server does not accept more bytes than the declared length.
+    """
 
-    resize_image.delay(image_path)
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            if request.method == "POST":
+                length = request.headers.get("content-length")
+                if length is None:
+                    raise HTTPException(status_code=status.HTTP_411_LENGTH_REQUIRED)
+                if not length.isdigit() or int(length) > max_upload_bytes():
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"request body over {max_upload_bytes()} bytes",
+                    )
+            return await handler(request)
+
+        return limited_handler
+
+
+router = APIRouter(prefix="/images", tags=["Изображения отелей"], route_class=UploadLimitRoute)
+
+# Names are content hashes, a file never changes under its name
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Served while the resized copy is not ready, it will be replaced soon
+NOT_RESIZED = "public, max-age=60"
+
+
+@router.post("/", response_model=list[ImageOut])
+async def upload_images(files: list[UploadFile]):
+    if len(files) > settings.MAX_IMAGES_PER_UPLOAD:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"more than {settings.MAX_IMAGES_PER_UPLOAD} files",
+        )
+    # Every file is checked before any is stored, a rejected upload leaves nothing behind
+    received = []
+    try:
+        for file in files:
+            received.append(await receive_image(file))
+        images = []
+        for file, (upload_path, name) in zip(files, received):
+            created = await link_image(upload_path, name)
+            if created:
+                resize_image.delay(str(media_path(name)))
+            images.append(ImageOut(filename=file.filename, name=name, duplicate=not created))
+    finally:
+        for upload_path, _ in received:
+            await upload_path.unlink(missing_ok=True)
+    return images
+
+
+@router.get("/{name}")
+async def get_image(name: str, request: Request, w: int | None = Query(None, gt=0)):
+    if not IMAGE_NAME.fullmatch(name) or not await media_path(name).exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="image not found")
+    webp = "image/webp" in request.headers.get("accept", "")
+    path, ready = await select_variant(name, w, webp)
+
+    headers = {"Cache-Control": IMMUTABLE if ready else NOT_RESIZED, "ETag": f'"{path.name}"'}
+    if w is not None:
+        headers["Vary"] = "Accept"
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in [etag.strip().removeprefix("W/") for etag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if settings.MEDIA_ACCEL_PREFIX:
+        # nginx sends the file itself with sendfile, Range included
+        headers["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_PREFIX}{path.name}"
+        return Response(headers=headers, media_type=mimetypes.guess_type(path.name)[0])
+    return FileResponse(path, headers=headers)
@@ -0,0 +1,19 @@
+import logging
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app import cache
+from app.metrics import CELERY_QUEUE, QUEUE_LENGTH, render
+
+router = APIRouter(tags=["Метрики"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if cache.redis is not None:
+        try:
+            QUEUE_LENGTH.labels(CELERY_QUEUE).set(await cache.redis.llen(CELERY_QUEUE))
+        except Exception:
+            logging.warning("Не удалось узнать длину очереди Celery", exc_info=True)
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
@@ -1,23 +1,44 @@
-from fastapi import APIRouter, status, HTTPException, Query
-from app.routers.dependencies import db
-from app.schemas.rooms import RoomIn, RoomOut, RoomPatch
-from sqlalchemy import insert, select, delete, update, not_, or_, and_
-from app.models import RoomsOrm, HotelsOrm, BookingsOrm, rooms_facilities
-from datetime import date
+from fastapi import APIRouter, Response, status, HTTPException
+from fastapi_cache.decorator import cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import CACHE_EXPIRE, invalidate, single_flight, versioned_key
+from app.routers.dependencies import (
+    RoomFilterParams,
+    db,
+    read_db,
+    room_filter,
+    calendar_filter,
+    decode_cursor,
+    set_next_cursor,
+)
+from app.schemas.rooms import RoomCalendarOut, RoomIn, RoomOut, RoomPatch
+from datetime import timedelta
+
+from sqlalchemy import Date, and_, cast, func, insert, select, delete, true, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from app.inventory import one_day, room_is_full
+from app.models import RoomsOrm, HotelsOrm, RoomInventoryOrm, rooms_facilities
 from sqlalchemy.orm import selectinload
 
 
 router = APIRouter(prefix="/hotels", tags=["rooms"])
 
+rooms_key = versioned_key("hotel:{hotel_id}")
+
+MAX_CALENDAR_NIGHTS = 366
+
 
 @router.get("/{hotel_id}/rooms", response_model=list[RoomOut])
-async def get_rooms(
-    hotel_id: int,
-    db: db,
-    date_from: date = Query(example="2024-09-08"),
-    date_to: date = Query(example="2024-09-20"),
-):
-    if date_from > date_to:
+async def get_rooms(hotel_id: int, db: read_db, filter: room_filter, response: Response):
+    rooms = await find_rooms(hotel_id, filter, db)
+    set_next_cursor(response, rooms, filter.limit)
+    return rooms
+
+
+@cache(expire=CACHE_EXPIRE, key_builder=rooms_key)
+@single_flight(rooms_key)
+async def find_rooms(hotel_id: int, filter: RoomFilterParams, db: AsyncSession) -> list[dict]:
+    if filter.date_from > filter.date_to:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="The 'date_from' must be earlier than 'date_to'.",
@@ -28,28 +49,14 @@ async def get_rooms(
 
     query = (
         select(RoomsOrm)
-        .where(
-            RoomsOrm.hotel_id == hotel_id,
-            not_(
-                select(BookingsOrm.room_id)
-                .where(
-                    BookingsOrm.room_id == RoomsOrm.id,
-                    or_(
-                        and_(
-                            BookingsOrm.date_from <= date_to,
-                            BookingsOrm.date_to >= date_from,
-                        ),
-                        and_(
-                            BookingsOrm.date_from >= date_from,
-                            BookingsOrm.date_to <= date_to,
-                        ),
-                    ),
-                )
-                .exists()
-            ),
-        )
+        .where(RoomsOrm.hotel_id == hotel_id, ~room_is_full(filter.date_from, filter.date_to))
+        .order_by(RoomsOrm.id)
+        .offset(filter.offset)
+        .limit(filter.limit)
         .options(selectinload(RoomsOrm.facilities))  # Eager load facilities
     )
+    if filter.after:
+        query = query.where(RoomsOrm.id > decode_cursor(filter.after))
 
     # Execute the query
     rooms = await db.scalars(query)
@@ -69,8 +76,46 @@ async def get_rooms(
     return result
 
 
+@router.get("/{hotel_id}/rooms/calendar", response_model=RoomCalendarOut)
+@cache(expire=CACHE_EXPIRE, key_builder=rooms_key)
+async def get_rooms_calendar(hotel_id: int, db: read_db, calendar: calendar_filter):
+    nights_count = (calendar.date_to - calendar.date_from).days
+    if not 0 < nights_count <= MAX_CALENDAR_NIGHTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Expected 1 to {MAX_CALENDAR_NIGHTS} nights from 'date_from' to 'date_to'.",
+        )
+    last_night = calendar.date_to - timedelta(days=1)
+    nights = select(
+        cast(func.generate_series(calendar.date_from, last_night, one_day), Date).label("night")
+    ).subquery()
+    free = func.greatest(RoomsOrm.quantity - func.coalesce(RoomInventoryOrm.booked, 0), 0)
+    query = (
+        select(RoomsOrm.id, func.array_agg(aggregate_order_by(free, nights.c.night)))
+        .join(nights, true())
+        .outerjoin(
+            RoomInventoryOrm,
+            and_(RoomInventoryOrm.room_id == RoomsOrm.id, RoomInventoryOrm.night == nights.c.night),
+        )
+        .where(RoomsOrm.hotel_id == hotel_id)
+        .group_by(RoomsOrm.id)
+        .order_by(RoomsOrm.id)
+    )
+    rows = (await db.execute(query)).all()
+    if not rows:
+        hotel = await db.scalar(select(HotelsOrm.id).where(HotelsOrm.id == hotel_id))
+        if hotel is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
+
+    return {
+        "nights": [calendar.date_from + timedelta(days=i) for i in range(nights_count)],
+        "rooms": [room_id for room_id, _ in rows],
+        "free": [free for _, free in rows],
+    }
+
+
 @router.get("/{hotel_id}/rooms/{room_id}", response_model=RoomOut)
-async def get_room(hotel_id: int, room_id: int, db: db):
+async def get_room(hotel_id: int, room_id: int, db: read_db):
     hotel = await db.scalar(select(HotelsOrm).where(HotelsOrm.id == hotel_id))
     if hotel is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
@@ -107,8 +152,10 @@ async def create_room(hotel_id: int, db: db, room_in: RoomIn):
     insert_values = [
         {"room_id": room.id, "facility_id": facility_id} for facility_id in room_in.facilities_ids
     ]
-    await db.execute(insert(rooms_facilities), insert_values)
+    if insert_values:
+        await db.execute(insert(rooms_facilities), insert_values)
     await db.commit()
+    await invalidate("catalogue", f"hotel:{hotel_id}")
     room_data = {
         "id": room.id,
         "hotel_id": room.hotel_id,
@@ -121,11 +168,17 @@ async def create_room(hotel_id: int, db: db, room_in: RoomIn):
     return room_data
 
 
+async def raise_room_not_found(db: AsyncSession, hotel_id: int):
+    # Only called once the write has matched nothing, tells the two 404s apart
+    await db.rollback()
+    hotel = await db.scalar(select(HotelsOrm.id).where(HotelsOrm.id == hotel_id))
+    if hotel is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="hotel not found")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="room not found")
+
+
 @router.put("/{hotel_id}/rooms/{room_id}", response_model=RoomOut)
 async def edit_room(hotel_id: int, room_id: int, db: db, room_in: RoomIn):
-    # Ensure room exists
-    await get_room(hotel_id, room_id, db)
-
     # Update the room's main attributes
     room = await db.scalar(
         update(RoomsOrm)
@@ -133,6 +186,8 @@ async def edit_room(hotel_id: int, room_id: int, db: db, room_in: RoomIn):
         .values(hotel_id=hotel_id, **room_in.model_dump(exclude={"facilities_ids"}))
         .returning(RoomsOrm)
     )
+    if room is None:
+        await raise_room_not_found(db, hotel_id)
 
     # Remove existing facilities associations for this room
     await db.execute(delete(rooms_facilities).where(rooms_facilities.c.room_id == room_id))
@@ -146,6 +201,7 @@ async def edit_room(hotel_id: int, room_id: int, db: db, room_in: RoomIn):
 
     # Commit the transaction to save the changes
     await db.commit()
+    await invalidate("catalogue", f"hotel:{hotel_id}")
 
     # Prepare the response data, including the updated facilities
     room_data = {
@@ -162,8 +218,6 @@ async def edit_room(hotel_id: int, room_id: int, db: db, room_in: RoomIn):
 
 @router.patch("/{hotel_id}/rooms/{room_id}", response_model=RoomOut)
 async def partially_edit_room(hotel_id: int, room_id: int, db: db, room_in: RoomPatch):
-    await get_room(hotel_id, room_id, db)
-
     # Update the room's main attributes
     room = await db.scalar(
         update(RoomsOrm)
@@ -175,6 +229,8 @@ async def partially_edit_room(hotel_id: int, room_id: int, db: db, room_in: Room
         .returning(RoomsOrm)
         .options(selectinload(RoomsOrm.facilities))
     )
+    if room is None:
+        await raise_room_not_found(db, hotel_id)
 
     # Remove existing facilities associations for this room
     room_facility = []
@@ -194,6 +250,7 @@ async def partially_edit_room(hotel_id: int, room_id: int, db: db, room_in: Room
 
     # Commit the transaction to save the changes
     await db.commit()
+    await invalidate("catalogue", f"hotel:{hotel_id}")
 
     # Prepare the response data, including the updated facilities
     room_data = {
@@ -210,14 +267,19 @@ async def partially_edit_room(hotel_id: int, room_id: int, db: db, room_in: Room
 
 @router.delete("/{hotel_id}/rooms/{room_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_room(hotel_id: int, room_id: int, db: db):
-    # Ensure the room exists
-    await get_room(hotel_id, room_id, db)
-
-    # Delete associations in rooms_facilities first
+    # Delete associations in rooms_facilities and the room inventory first
     await db.execute(delete(rooms_facilities).where(rooms_facilities.c.room_id == room_id))
+    await db.execute(delete(RoomInventoryOrm).where(RoomInventoryOrm.room_id == room_id))
 
-    # Delete the room
-    await db.execute(delete(RoomsOrm).where(RoomsOrm.hotel_id == hotel_id, RoomsOrm.id == room_id))
+    # Delete the room, nothing above is kept if it is not in this hotel
+    room = await db.scalar(
+        delete(RoomsOrm)
+        .where(RoomsOrm.hotel_id == hotel_id, RoomsOrm.id == room_id)
+        .returning(RoomsOrm.id)
+    )
+    if room is None:
+        await raise_room_not_found(db, hotel_id)
 
     # Commit the transaction
     await db.commit()
+    await invalidate("catalogue", f"hotel:{hotel_id}")
@@ -0,0 +1,13 @@
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class SlowQueryOut(BaseModel):
+    at: datetime
+    route: str | None
+    seconds: float
+    statement: str
+    parameters: Any
+    plan: str | None
@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+
+
+class HotelImport(BaseModel):
+    id: int = Field(gt=0)
+    title: str = Field(max_length=100)
+    location: str
+
+
+class RoomImport(BaseModel):
+    id: int = Field(gt=0)
+    hotel_id: int
+    title: str
+    description: str | None = None
+    price: int
+    quantity: int = Field(gt=0)
+
+
+class RoomFacilityImport(BaseModel):
+    room_id: int
+    facility_id: int
+
+
+class ImportRowError(BaseModel):
+    file: str
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    hotels: int = 0
+    rooms: int = 0
+    rooms_facilities: int = 0
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class ImageOut(BaseModel):
+    filename: str | None
+    name: str
+    duplicate: bool
@@ -1,3 +1,5 @@
+from datetime import date
+
 from pydantic import BaseModel
 
 
@@ -20,3 +22,10 @@ class RoomPatch(BaseModel):
     price: int | None = None
     quantity: int | None = None
     facilities_ids: list[int] | None = None
+
+
+class RoomCalendarOut(BaseModel):
+    # free[i][j] is the number of free units of rooms[i] on nights[j]
+    nights: list[date]
+    rooms: list[int]
+    free: list[list[int]]
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import random
+import re
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.metrics import route_path
+
+SLOW_QUERY_BUFFER = 100
+# EXPLAIN ANALYZE runs the statement again, a runaway one is stopped here
+EXPLAIN_TIMEOUT = "30s"
+
+# The scope of the request being handled, set by RequestMiddleware
+current_request: ContextVar[dict | None] = ContextVar("current_request", default=None)
+
+# Newest last, shown by GET /admin/slow-queries
+slow_queries: deque[dict] = deque(maxlen=SLOW_QUERY_BUFFER)
+explaining: set[asyncio.Task] = set()
+
+
+def redact(value):
+    # Emails, names and hashes are strings, ids, prices and dates stay readable
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+# The bound values are in the plan as 'value'::type, only dates and numbers stay readable
+PLAN_LITERAL = re.compile(r"'(?:[^']|'')*'(::\w+)?")
+READABLE_TYPES = {"date", "timestamp", "integer", "bigint", "smallint", "numeric", "boolean"}
+LOCKING_CLAUSE = re.compile(r"\bFOR\s+(UPDATE|NO\s+KEY\s+UPDATE|SHARE|KEY\s+SHARE)\b")
+
+
+def redact_plan(plan: str) -> str:
+    def replace(literal: re.Match) -> str:
+        cast = literal.group(1) or ""
+        if cast[2:] in READABLE_TYPES:
+            return literal.group(0)
+        return f"'<redacted>'{cast}"
+
+    return PLAN_LITERAL.sub(replace, plan)
+
+
+def is_read_only(statement: str) -> bool:
+    statement = statement.lstrip().upper()
+    return statement.startswith("SELECT") and not LOCKING_CLAUSE.search(statement)
+
+
+async def explain(engine: AsyncEngine, entry: dict, statement: str, parameters):
+    try:
+        async with engine.connect() as conn:
+            # Anything that writes and got past is_read_only fails here
+            await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            await conn.exec_driver_sql(f"SET LOCAL statement_timeout = '{EXPLAIN_TIMEOUT}'")
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters
+            )
+            entry["plan"] = redact_plan("\n".join(row[0] for row in result))
+            await conn.rollback()
+    except Exception as e:
+        entry["plan"] = f"EXPLAIN failed: {e}"
+
+
+def record_slow_query(
+    conn: Connection, statement: str, parameters, executemany: bool, seconds: float
+):
+    if (
+        settings.SLOW_QUERY_SECONDS is None
+        or seconds < settings.SLOW_QUERY_SECONDS
+        or statement.startswith("EXPLAIN")
+    ):
+        return
+    scope = current_request.get()
+    route = None if scope is None else f"{scope['method']} {route_path(scope)}"
+    entry = {
+        "at": datetime.now(timezone.utc),
+        "route": route,
+        "seconds": seconds,
+        "statement": statement,
+        "parameters": redact(parameters),
+        "plan": None,
+    }
+    slow_queries.append(entry)
+    logging.warning(
+        f"Медленный запрос {seconds * 1000:.0f} мс ({route}): {statement} {entry['parameters']}"
+    )
+
+    # Only one plan at a time, the database is already struggling
+    if (
+        executemany
+        or explaining
+        or not is_read_only(statement)
+        or random.random() >= settings.SLOW_QUERY_EXPLAIN_RATE
+    ):
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(explain(AsyncEngine(conn.engine), entry, statement, parameters))
+    explaining.add(task)
+    task.add_done_callback(explaining.discard)
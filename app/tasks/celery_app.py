@@ -1,6 +1,10 @@
+import time
+
 from celery import Celery
+from celery.signals import celeryd_init, task_postrun, task_prerun, worker_process_shutdown
 
 from app.config import settings
+from app.metrics import TASK_DURATION, mark_process_dead, start_metrics_server
 
 celery_instance = Celery(
     "tasks",
@@ -14,5 +18,35 @@ celery_instance.conf.beat_schedule = {
     "luboe-nazvanie": {
         "task": "booking_today_checkin",
         "schedule": 5,
+        # Runs that waited longer than the interval are dropped, the next one catches up
+        "options": {"expires": 5},
     }
 }
+
+
+# task_id -> perf_counter at start, for the duration histogram
+task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id, task, **kwargs):
+    task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task(task_id, task, state=None, **kwargs):
+    started = task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@worker_process_shutdown.connect
+def forget_worker_metrics(**kwargs):
+    mark_process_dead()
+
+
+@celeryd_init.connect
+def serve_worker_metrics(**kwargs):
+    # In the main worker process, the pool processes write into PROMETHEUS_MULTIPROC_DIR
+    if settings.CELERY_METRICS_PORT:
+        start_metrics_server(settings.CELERY_METRICS_PORT)
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from app.metrics import LOOP_LAG, LOOP_STALLS
+
+# Lag samples kept for percentiles() in benchmarks
+RECENT_LAGS = 10_000
+
+
+class LoopWatchdog:
+    """Measures event loop lag and logs the stack of code that holds the loop too long.
+
+    A task on the loop sleeps for interval seconds and records how late it woke up.
+    A thread checks the heartbeat of that task: once it is older than threshold, the
+    loop is blocked right now and the stack of the loop thread is the blocking call.
+    """
+
+    def __init__(self, threshold: float, interval: float | None = None):
+        self.threshold = threshold
+        self.interval = interval or threshold / 4
+        self.heartbeat = time.monotonic()
+        self.lags: deque[float] = deque(maxlen=RECENT_LAGS)
+        self.stalls = 0
+        self.task: asyncio.Task | None = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        self.task = asyncio.create_task(self.beat())
+        thread = threading.Thread(
+            target=self.watch, args=(threading.get_ident(),), name="loop-watchdog", daemon=True
+        )
+        thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+
+    async def beat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.heartbeat = time.monotonic()
+            self.lags.append(lag)
+            LOOP_LAG.observe(lag)
+
+    def watch(self, loop_thread_id: int):
+        reported = None
+        while not self.stopped.wait(self.interval):
+            heartbeat = self.heartbeat
+            blocked = time.monotonic() - heartbeat
+            # One report per stall, the heartbeat moves once the loop is free again
+            if blocked < self.threshold or heartbeat == reported:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is None:
+                return
+            self.stalls += 1
+            LOOP_STALLS.inc()
+            stack = "".join(traceback.format_stack(frame))
+            logging.warning(f"Цикл событий заблокирован уже {blocked * 1000:.0f} мс:\n{stack}")
+
+    def percentiles(self) -> dict[str, float]:
+        if len(self.lags) < 2:
+            return {"p50": 0.0, "p99": 0.0, "max": max(self.lags, default=0.0)}
+        cuts = statistics.quantiles(self.lags, n=100)
+        return {"p50": cuts[49], "p99": cuts[98], "max": max(self.lags)}
@@ -0,0 +1,83 @@
+"""Fire parallel bookings at one room and count how many nights were oversold.
+
+python -m benchmarks.booking_stress --requests 300 --quantity 10
+python -m benchmarks.booking_stress --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+
+from app.database import async_session_maker
+from app.main import app
+from app.models import BookingsOrm
+
+
+def make_client(url: str | None) -> AsyncClient:
+    if url:
+        return AsyncClient(base_url=url, timeout=60)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+
+async def prepare_room(ac: AsyncClient, quantity: int) -> int:
+    email = f"stress-{uuid.uuid4().hex[:8]}@example.com"
+    await ac.post("/auth/register", json={"email": email, "password": "stress"})
+    response = await ac.post("/auth/login", json={"email": email, "password": "stress"})
+    response.raise_for_status()
+
+    response = await ac.post("/hotels/", json={"title": "Stress hotel", "location": "Stress"})
+    response.raise_for_status()
+    hotel_id = response.json()["id"]
+    response = await ac.post(
+        f"/hotels/{hotel_id}/rooms",
+        json={"title": "Stress room", "price": 1000, "quantity": quantity},
+    )
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def run(args):
+    async with make_client(args.url) as ac:
+        room_id = await prepare_room(ac, args.quantity)
+        booking = {"room_id": room_id, "date_from": "2030-01-01", "date_to": "2030-01-05"}
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def book():
+            async with semaphore:
+                response = await ac.post("/bookings/", json=booking)
+                return response.status_code
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(book() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    async with async_session_maker() as session:
+        booked = await session.scalar(
+            select(func.count()).select_from(BookingsOrm).where(BookingsOrm.room_id == room_id)
+        )
+
+    print(f"room_id:     {room_id} (quantity {args.quantity})")
+    print(f"requests:    {args.requests}, concurrency {args.concurrency}")
+    print(f"statuses:    {dict(Counter(statuses))}")
+    print(f"throughput:  {args.requests / elapsed:.1f} req/s ({elapsed:.2f}s)")
+    print(f"booked:      {booked}")
+    print(f"oversold:    {max(0, booked - args.quantity)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--quantity", type=int, default=10)
+    parser.add_argument("--url", help="running server, the in-process ASGI app by default")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Burst of identical hotel searches on an expired cache key, counts the queries sent to Postgres.
+
+python -m benchmarks.cache_stampede --requests 200 --rounds 3
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from httpx import ASGITransport, AsyncClient
+from redis import asyncio as aioredis
+from sqlalchemy import event
+
+from app.cache import cache_stats, init_cache, invalidate, listen_invalidations
+from app.config import settings
+from app.database import engine
+from app.main import app
+
+SEARCH = {"date_from": "2030-01-01", "date_to": "2030-01-05", "limit": 20}
+
+
+async def run(args):
+    init_cache(aioredis.from_url(settings.REDIS_URL))
+    listener = asyncio.create_task(listen_invalidations())
+    queries = 0
+
+    def count(*_):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as ac:
+        await invalidate("availability")
+        queries = 0
+        await ac.get("/hotels/", params=SEARCH)
+        per_request = queries
+        print(f"requests:    {args.requests} per round, {per_request} queries per recompute")
+        print(f"uncoalesced: {per_request * args.requests} queries per round")
+
+        for round in range(1, args.rounds + 1):
+            # A version bump drops the entry for every worker, like an expired TTL
+            await invalidate("availability")
+            queries = 0
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                *(ac.get("/hotels/", params=SEARCH) for _ in range(args.requests))
+            )
+            elapsed = time.perf_counter() - started
+            statuses = dict(Counter(response.status_code for response in responses))
+            print(f"round {round}:     {queries} queries, {statuses}, {elapsed:.2f}s")
+
+    listener.cancel()
+    print(f"cache:       {cache_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Latency and connection pool checkouts of cached endpoints, on cache hits and on misses.
+
+python -m benchmarks.cached_latency --requests 2000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import ASGITransport, AsyncClient
+from redis import asyncio as aioredis
+from sqlalchemy import event
+
+from app.cache import init_cache, listen_invalidations
+from app.config import settings
+from app.database import engine
+from app.main import app
+
+ENDPOINTS = ["/facilities/", "/hotels/"]
+
+
+async def measure(ac: AsyncClient, url: str, params: list[dict], concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get(params: dict) -> float:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await ac.get(url, params=params)
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(get(p) for p in params))
+
+
+async def run(args):
+    init_cache(aioredis.from_url(settings.REDIS_URL))
+    listener = asyncio.create_task(listen_invalidations())
+    checkouts = 0
+
+    def count(*_):
+        nonlocal checkouts
+        checkouts += 1
+
+    event.listen(engine.sync_engine.pool, "checkout", count)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as ac:
+        for url in ENDPOINTS:
+            await ac.get(url)
+        phases = [
+            ("/facilities/", "hit", [{}] * args.requests),
+            ("/hotels/", "hit", [{}] * args.requests),
+            # Every request has its own key
+            ("/hotels/", "miss", [{"offset": 1_000_000 + i} for i in range(args.requests)]),
+        ]
+        for url, phase, params in phases:
+            checkouts = 0
+            latencies = sorted(await measure(ac, url, params, args.concurrency))
+            p50 = statistics.median(latencies) * 1000
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+            print(
+                f"{url:<13} {phase:<4}  checkouts {checkouts:>5}  p50 {p50:6.1f}ms  p99 {p99:6.1f}ms"
+            )
+
+    listener.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
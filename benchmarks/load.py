@@ -0,0 +1,274 @@
+"""Replay a mix of searches, room lookups, logins and bookings, report latency per endpoint.
+
+python -m benchmarks.load --duration 60 --concurrency 50 --out results.json
+python -m benchmarks.load --url http://localhost:8000 --baseline results.json
+
+Needs the users of benchmarks.seed. Results are saved as JSON, --baseline prints the change.
+The bookings the bench users made during the run are deleted afterwards and the cached
+availability of their hotels is dropped, every run starts from the same data.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient
+from redis import asyncio as aioredis
+from sqlalchemy import text
+
+from app.cache import init_cache, invalidate, listen_invalidations
+from app.config import settings
+from app.database import async_session_maker
+from benchmarks.booking_stress import make_client
+from benchmarks.seed import BENCH_PASSWORD, BOOKING_DAYS, CITIES, FIRST_NIGHT
+
+# Share of each request in the mix
+MIX = {
+    "search_dates": 30,
+    "search_location": 15,
+    "hotel_rooms": 20,
+    "room": 15,
+    "calendar": 5,
+    "login": 5,
+    "booking": 10,
+}
+SAMPLE_ROOMS = 10_000
+SAMPLE_USERS = 1_000
+
+
+def stay(rng: random.Random, max_nights: int = 7) -> dict:
+    date_from = FIRST_NIGHT + timedelta(days=rng.randrange(BOOKING_DAYS))
+    date_to = date_from + timedelta(days=rng.randint(1, max_nights))
+    return {"date_from": date_from.isoformat(), "date_to": date_to.isoformat()}
+
+
+def make_request(name: str, rng: random.Random, rooms: list, user: str) -> tuple[str, str, dict]:
+    hotel_id, room_id = rng.choice(rooms)
+    if name == "search_dates":
+        return "get", "/hotels/", {"params": stay(rng)}
+    if name == "search_location":
+        return "get", "/hotels/", {"params": {"location": rng.choice(CITIES), **stay(rng)}}
+    if name == "hotel_rooms":
+        return "get", f"/hotels/{hotel_id}/rooms", {"params": stay(rng)}
+    if name == "room":
+        return "get", f"/hotels/{hotel_id}/rooms/{room_id}", {}
+    if name == "calendar":
+        return "get", f"/hotels/{hotel_id}/rooms/calendar", {"params": stay(rng, 31)}
+    if name == "login":
+        return "post", "/auth/login", {"json": {"email": user, "password": BENCH_PASSWORD}}
+    return "post", "/bookings/", {"json": {"room_id": room_id, **stay(rng)}}
+
+
+async def load_samples() -> tuple[list, list]:
+    async with async_session_maker() as session:
+        # The same rooms for every run on the same data
+        await session.execute(text("SELECT setseed(0.5)"))
+        rooms = (
+            await session.execute(
+                text("SELECT hotel_id, id FROM rooms ORDER BY random() LIMIT :limit"),
+                {"limit": SAMPLE_ROOMS},
+            )
+        ).all()
+        users = (
+            await session.scalars(
+                text("SELECT email FROM users WHERE email LIKE 'bench%' LIMIT :limit"),
+                {"limit": SAMPLE_USERS},
+            )
+        ).all()
+    if not rooms or not users:
+        raise SystemExit("No rooms or bench users, run python -m benchmarks.seed first")
+    return sorted(tuple(room) for room in rooms), sorted(users)
+
+
+async def last_booking_id() -> int:
+    async with async_session_maker() as session:
+        return await session.scalar(text("SELECT coalesce(max(id), 0) FROM bookings"))
+
+
+async def remove_bookings_after(booking_id: int) -> tuple[int, list[int]]:
+    """Deletes the bookings of the bench users, returns how many and the hotels they were in."""
+    # Their nights are given back to the inventory in the same statement
+    async with async_session_maker() as session:
+        result = await session.execute(
+            text(
+                """
+                WITH removed AS (
+                    DELETE FROM bookings
+                    WHERE id > :booking_id
+                        AND user_id IN (SELECT id FROM users WHERE email LIKE 'bench%')
+                    RETURNING room_id, date_from, date_to
+                ), nights AS (
+                    SELECT room_id, night::date AS night, count(*) AS booked
+                    FROM removed, generate_series(date_from, date_to - 1, interval '1 day') night
+                    GROUP BY room_id, night::date
+                ), released AS (
+                    UPDATE room_inventory SET booked = room_inventory.booked - nights.booked
+                    FROM nights
+                    WHERE room_inventory.room_id = nights.room_id
+                        AND room_inventory.night = nights.night
+                )
+                SELECT count(*), coalesce(array_agg(DISTINCT rooms.hotel_id), '{}')
+                FROM removed JOIN rooms ON rooms.id = removed.room_id
+                """
+            ),
+            {"booking_id": booking_id},
+        )
+        removed, hotel_ids = result.one()
+        await session.commit()
+    return removed, hotel_ids
+
+
+async def client_loop(
+    ac: AsyncClient, rng: random.Random, rooms: list, user: str, deadline: float, results: dict
+):
+    names, weights = list(MIX), list(MIX.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, url, kwargs = make_request(name, rng, rooms, user)
+        started = time.perf_counter()
+        try:
+            response = await ac.request(method, url, **kwargs)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        results[name]["latencies"].append(time.perf_counter() - started)
+        results[name]["statuses"][str(status)] += 1
+
+
+def percentile(latencies: list[float], share: float) -> float:
+    return latencies[max(0, int(len(latencies) * share) - 1)] * 1000
+
+
+def summarize(results: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name, result in sorted(results.items()):
+        latencies = sorted(result["latencies"])
+        statuses = result["statuses"]
+        endpoints[name] = {
+            "requests": len(latencies),
+            "throughput": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "errors": sum(
+                count
+                for status, count in statuses.items()
+                if not status.isdigit() or int(status) >= 500
+            ),
+            "statuses": dict(statuses),
+        }
+    return endpoints
+
+
+def change(value: float, before: float) -> str:
+    # An endpoint that got no requests in the baseline has nothing to compare with
+    return f"{(value / before - 1) * 100:+.0f}%" if before else "n/a"
+
+
+def report(endpoints: dict, baseline: dict | None):
+    print(f"{'endpoint':<16} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for name, result in endpoints.items():
+        line = (
+            f"{name:<16} {result['throughput']:8.1f} {result['p50_ms']:7.1f}ms "
+            f"{result['p95_ms']:7.1f}ms {result['p99_ms']:7.1f}ms {result['errors']:7}"
+        )
+        if baseline and (before := baseline["endpoints"].get(name)):
+            throughput = change(result["throughput"], before["throughput"])
+            p95 = change(result["p95_ms"], before["p95_ms"])
+            line += f"   vs baseline: req/s {throughput}, p95 {p95}"
+        print(line)
+
+
+async def run(args):
+    rooms, users = await load_samples()
+    booking_id = await last_booking_id()
+    listener = None
+    # Also for a running server, the cleanup drops its cached availability
+    init_cache(aioredis.from_url(settings.REDIS_URL))
+    if not args.url:
+        listener = asyncio.create_task(listen_invalidations())
+
+    results = defaultdict(lambda: {"latencies": [], "statuses": Counter()})
+    clients = [make_client(args.url) for _ in range(args.concurrency)]
+    users = [users[i % len(users)] for i in range(args.concurrency)]
+    for response in await asyncio.gather(
+        *(
+            ac.post("/auth/login", json={"email": user, "password": BENCH_PASSWORD})
+            for ac, user in zip(clients, users)
+        )
+    ):
+        response.raise_for_status()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    try:
+        await asyncio.gather(
+            *(
+                client_loop(
+                    ac,
+                    random.Random(args.random_seed + i),
+                    rooms,
+                    users[i],
+                    deadline,
+                    results,
+                )
+                for i, ac in enumerate(clients)
+            )
+        )
+    finally:
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(ac.aclose() for ac in clients))
+        if listener is not None:
+            listener.cancel()
+        removed, hotel_ids = await remove_bookings_after(booking_id)
+        await invalidate("availability", *(f"hotel:{hotel_id}" for hotel_id in hotel_ids))
+        print(f"cleanup:     {removed} bookings of the run removed")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    endpoints = summarize(results, elapsed)
+    report(endpoints, baseline)
+
+    total = sum(result["requests"] for result in endpoints.values())
+    print(f"total:       {total} requests, {total / elapsed:.1f} req/s ({elapsed:.1f}s)")
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(
+                {
+                    "finished_at": datetime.now(timezone.utc).isoformat(),
+                    "target": args.url or "asgi",
+                    "python": platform.python_version(),
+                    "duration": args.duration,
+                    "concurrency": args.concurrency,
+                    "random_seed": args.random_seed,
+                    "mix": MIX,
+                    "elapsed": elapsed,
+                    "requests": total,
+                    "endpoints": endpoints,
+                },
+                file,
+                indent=2,
+            )
+        print(f"saved:       {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--out", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare with")
+    parser.add_argument("--url", help="running server, the in-process ASGI app by default")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
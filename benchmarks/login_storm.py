@@ -0,0 +1,89 @@
+"""Latency of another endpoint while a storm of logins hashes passwords.
+
+python -m benchmarks.login_storm --logins 200 --concurrency 50
+python -m benchmarks.login_storm --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from collections import Counter
+
+from httpx import AsyncClient
+
+from app.watchdog import LoopWatchdog
+from benchmarks.booking_stress import make_client
+
+PROBES = 200
+PROBE_INTERVAL = 0.01
+
+
+async def probe(ac: AsyncClient, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set() or len(latencies) < PROBES:
+        started = time.perf_counter()
+        response = await ac.get("/auth/me")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(PROBE_INTERVAL)
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"{name:<12} /auth/me p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  max {latencies[-1] * 1000:7.1f}ms"
+    )
+
+
+async def run(args):
+    credentials = {"email": f"storm-{uuid.uuid4().hex[:8]}@example.com", "password": "storm"}
+    async with make_client(args.url) as ac, make_client(args.url) as storm:
+        await ac.post("/auth/register", json=credentials)
+        response = await ac.post("/auth/login", json=credentials)
+        response.raise_for_status()
+
+        stop = asyncio.Event()
+        stop.set()
+        report("idle", await probe(ac, stop))
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def login():
+            async with semaphore:
+                response = await storm.post("/auth/login", json=credentials)
+                return response.status_code
+
+        stop.clear()
+        prober = asyncio.create_task(probe(ac, stop))
+        # Only sees this loop, that is the server loop for the in-process app
+        watchdog = LoopWatchdog(threshold=0.1)
+        watchdog.start()
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        watchdog.stop()
+        stop.set()
+        report("login storm", await prober)
+
+    lag = {name: f"{seconds * 1000:.1f}ms" for name, seconds in watchdog.percentiles().items()}
+    print(f"loop lag:    {lag}, {watchdog.stalls} stalls over 100ms")
+
+    print(f"logins:      {args.logins}, concurrency {args.concurrency}, {dict(Counter(statuses))}")
+    print(f"throughput:  {args.logins / elapsed:.1f} logins/s ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="running server, the in-process ASGI app by default")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
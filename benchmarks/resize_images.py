@@ -0,0 +1,94 @@
+"""Time and peak RSS of the resize_image pipeline per image, next to the plain full-size resize.
+
+python -m benchmarks.resize_images --megapixels 12 24 40
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from PIL import Image
+
+from app.media import RESIZE_SIZES, make_variants
+
+
+def generate_image(path: str, megapixels: int):
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Gradients with noise, compress about like a photo
+    noise = Image.effect_noise((width, height), 40)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    channels = [
+        Image.blend(gradient, noise, 0.5),
+        noise,
+        gradient.transpose(Image.Transpose.ROTATE_180),
+    ]
+    Image.merge("RGB", channels).save(path, quality=90)
+
+
+def plain_resize(image_path: str) -> list[str]:
+    name, ext = os.path.splitext(image_path)
+    paths = []
+    img = Image.open(image_path)
+    for size in RESIZE_SIZES:
+        img_resized = img.resize(
+            (size, int(img.height * (size / img.width))), Image.Resampling.LANCZOS
+        )
+        paths.append(f"{name}_{size}px{ext}")
+        img_resized.save(paths[-1])
+    return paths
+
+
+def peak_rss() -> float:
+    # ru_maxrss survives exec on Linux and would include the parent, VmHWM does not
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(pipeline: str, image_path: str, results):
+    started = time.perf_counter()
+    (make_variants if pipeline == "pipeline" else plain_resize)(image_path)
+    elapsed = time.perf_counter() - started
+    results.put((elapsed, peak_rss()))
+
+
+def run_isolated(pipeline: str, image_path: str) -> tuple[float, float]:
+    # A fresh process per run, so peak RSS belongs to this image only
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=measure, args=(pipeline, image_path, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=int, nargs="+", default=[12, 24, 40])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus:
+        for megapixels in args.megapixels:
+            image_path = os.path.join(corpus, f"{megapixels}mp.jpeg")
+            generate_image(image_path, megapixels)
+            size = os.path.getsize(image_path) / 1024 / 1024
+            for pipeline in ("plain", "pipeline"):
+                elapsed, peak_rss = run_isolated(pipeline, image_path)
+                print(
+                    f"{megapixels:>3} MP ({size:5.1f} MiB) {pipeline:<9}"
+                    f" {elapsed:6.2f}s  peak RSS {peak_rss:7.1f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
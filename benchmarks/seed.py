@@ -0,0 +1,195 @@
+"""Fill the database with a large synthetic dataset through COPY.
+
+python -m benchmarks.seed --hotels 10000 --rooms 500000 --facilities 50 --bookings 10000000
+python -m benchmarks.seed --hotels 1000 --rooms 20000 --bookings 200000 --random-seed 7
+
+Rows are added after the existing ones, the same arguments always produce the same data.
+Users are bench<N>@example.com with the password BENCH_PASSWORD.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from app.database import async_session_maker_null_pool
+from app.inventory import backfill_inventory
+from app.routers.dependencies import pwd_context
+
+BENCH_PASSWORD = "bench"
+FIRST_NIGHT = date(2030, 1, 1)
+BOOKING_DAYS = 365
+MAX_NIGHTS = 7
+# Random stays tried for a booking before the room is taken as full
+BOOKING_ATTEMPTS = 10
+CHUNK_ROWS = 100_000
+
+CITIES = [
+    "Moscow", "Saint Petersburg", "Kazan", "Sochi", "Novosibirsk", "Yekaterinburg",
+    "Kaliningrad", "Vladivostok", "Irkutsk", "Murmansk", "Samara", "Nizhny Novgorod",
+]  # fmt: skip
+STREETS = ["Lenina", "Mira", "Sadovaya", "Pushkina", "Gagarina", "Naberezhnaya", "Tsentralnaya"]
+ROOM_TYPES = ["Standard", "Superior", "Deluxe", "Family", "Suite", "Studio"]
+
+
+def chunks(rows, size: int = CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bookings(rng: random.Random, first: dict, args, quantities: list[int]):
+    """The bookings spread evenly over the new rooms, no night is booked over the quantity."""
+    booking_ids = itertools.count(first["bookings"])
+    per_room, extra = divmod(args.bookings, max(1, args.rooms))
+    for room, quantity in enumerate(quantities):
+        occupied = bytearray(BOOKING_DAYS + MAX_NIGHTS)
+        for _ in range(per_room + (room < extra)):
+            for _ in range(BOOKING_ATTEMPTS):
+                start = rng.randrange(BOOKING_DAYS)
+                nights = rng.randint(1, MAX_NIGHTS)
+                if max(occupied[start : start + nights]) < quantity:
+                    break
+            else:
+                continue
+            for night in range(start, start + nights):
+                occupied[night] += 1
+            date_from = FIRST_NIGHT + timedelta(days=start)
+            yield (
+                next(booking_ids),
+                first["users"] + rng.randrange(args.users),
+                first["rooms"] + room,
+                date_from,
+                date_from + timedelta(days=nights),
+                nights * rng.randrange(1500, 30000, 100),
+            )
+
+
+async def copy(raw, table: str, columns: list[str], rows) -> int:
+    copied = 0
+    for chunk in chunks(rows):
+        await raw.copy_records_to_table(table, records=chunk, columns=columns)
+        copied += len(chunk)
+    return copied
+
+
+async def next_id(raw, table: str) -> int:
+    return await raw.fetchval(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")
+
+
+async def run(args):
+    rng = random.Random(args.random_seed)
+    # One hash for everybody, hashing every password would take longer than the rest
+    hashed_password = pwd_context.hash(BENCH_PASSWORD)
+
+    async with async_session_maker_null_pool() as session:
+        conn = await session.connection()
+        raw = (await conn.get_raw_connection()).driver_connection
+        first = {
+            table: await next_id(raw, table)
+            for table in ("hotels", "rooms", "facilities", "users", "bookings")
+        }
+        quantities = [rng.randint(1, 5) for _ in range(args.rooms)]
+
+        steps = [
+            (
+                "hotels",
+                ["id", "title", "location"],
+                (
+                    (
+                        first["hotels"] + i,
+                        f"Hotel {rng.choice(STREETS)} {first['hotels'] + i}",
+                        f"{rng.choice(CITIES)}, {rng.choice(STREETS)} {rng.randint(1, 200)}",
+                    )
+                    for i in range(args.hotels)
+                ),
+            ),
+            (
+                "facilities",
+                ["id", "title"],
+                ((first["facilities"] + i, f"Facility {i}") for i in range(args.facilities)),
+            ),
+            (
+                "rooms",
+                ["id", "hotel_id", "title", "description", "price", "quantity"],
+                (
+                    (
+                        first["rooms"] + i,
+                        first["hotels"] + i % args.hotels,
+                        f"{rng.choice(ROOM_TYPES)} room",
+                        None,
+                        rng.randrange(1500, 30000, 100),
+                        quantities[i],
+                    )
+                    for i in range(args.rooms)
+                ),
+            ),
+            (
+                "rooms_facilities",
+                ["room_id", "facility_id"],
+                (
+                    (first["rooms"] + i, first["facilities"] + facility)
+                    for i in range(args.rooms if args.facilities else 0)
+                    for facility in rng.sample(range(args.facilities), min(3, args.facilities))
+                ),
+            ),
+            (
+                "users",
+                ["id", "email", "hashed_password"],
+                (
+                    (first["users"] + i, f"bench{first['users'] + i}@example.com", hashed_password)
+                    for i in range(args.users)
+                ),
+            ),
+            (
+                "bookings",
+                ["id", "user_id", "room_id", "date_from", "date_to", "price"],
+                bookings(rng, first, args, quantities),
+            ),
+        ]
+        for table, columns, rows in steps:
+            started = time.perf_counter()
+            copied = await copy(raw, table, columns, rows)
+            print(f"{table:<17} {copied:>10} rows  {time.perf_counter() - started:7.1f}s")
+
+        for table in first:
+            await session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT coalesce(max(id), 1) FROM {table}))"
+                )
+            )
+        started = time.perf_counter()
+        await backfill_inventory(session)
+        print(f"{'room_inventory':<17} {'rebuilt':>10}       {time.perf_counter() - started:7.1f}s")
+        await session.commit()
+
+    async with async_session_maker_null_pool() as session:
+        await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        started = time.perf_counter()
+        await session.execute(text("ANALYZE"))
+        print(f"{'analyze':<17} {'':>10}       {time.perf_counter() - started:7.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hotels", type=int, default=10_000)
+    parser.add_argument("--rooms", type=int, default=500_000)
+    parser.add_argument("--facilities", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--bookings", type=int, default=10_000_000)
+    parser.add_argument("--random-seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
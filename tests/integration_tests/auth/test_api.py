@@ -1,4 +1,12 @@
+import asyncio
+
 import pytest
+from passlib.context import CryptContext
+from sqlalchemy import insert, select
+
+from app.config import settings
+from app.models import UsersOrm
+from app.routers.dependencies import pwd_context
 
 
 @pytest.mark.parametrize(
@@ -49,3 +57,30 @@ async def test_auth_flow(email: str, password: str, status_code: int, ac):
     resp_logout = await ac.post("/auth/logout")
     assert resp_logout.status_code == 200
     assert "access_token" not in ac.cookies
+
+
+async def test_login_rehashes_outdated_cost(ac, db):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("1234")
+    await db.execute(insert(UsersOrm).values(email="old@pes.com", hashed_password=old_hash))
+    await db.commit()
+
+    resp_login = await ac.post("/auth/login", json={"email": "old@pes.com", "password": "1234"})
+    assert resp_login.status_code == 200
+
+    new_hash = await db.scalar(
+        select(UsersOrm.hashed_password).where(UsersOrm.email == "old@pes.com")
+    )
+    assert new_hash.startswith(f"$2b${settings.BCRYPT_ROUNDS:02}$")
+    assert pwd_context.verify("1234", new_hash)
+
+
+async def test_concurrent_registrations_of_one_email(ac):
+    responses = await asyncio.gather(
+        *(
+            ac.post("/auth/register", json={"email": "twice@pes.com", "password": "1234"})
+            for _ in range(3)
+        )
+    )
+    assert sorted(response.status_code for response in responses) == [201, 409, 409]
+    conflicts = [response.json()["detail"] for response in responses if response.status_code == 409]
+    assert conflicts == ["user already exists"] * 2
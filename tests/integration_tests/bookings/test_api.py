@@ -1,7 +1,10 @@
+import asyncio
+import json
 import pytest
-from sqlalchemy import delete
+from sqlalchemy import delete, func, select
 from app.models import *  # noqa: F403
 from tests.conftest import get_db_null_pool
+from tests.integration_tests.hotels.test_api import BAD_CURSORS
 
 
 @pytest.mark.parametrize(
@@ -14,6 +17,7 @@ from tests.conftest import get_db_null_pool
         (1, "2024-08-05", "2024-08-14", 200),
         (1, "2024-08-06", "2024-08-15", 400),
         (1, "2024-08-17", "2024-08-25", 200),
+        (1, "2024-08-25", "2024-08-25", 400),
     ],
 )
 async def test_add_booking(room_id, date_from, date_to, status_code, db, authenticated_ac):
@@ -32,10 +36,23 @@ async def test_add_booking(room_id, date_from, date_to, status_code, db, authent
         assert res["status"] == "ok"
 
 
+async def test_full_room_hidden_from_search(authenticated_ac):
+    params = {"date_from": "2024-08-06", "date_to": "2024-08-08"}
+    response = await authenticated_ac.get("/hotels/1/rooms", params=params)
+    assert response.status_code == 200
+    assert 1 not in [room["id"] for room in response.json()]
+
+    params = {"date_from": "2024-08-15", "date_to": "2024-08-17"}
+    response = await authenticated_ac.get("/hotels/1/rooms", params=params)
+    assert response.status_code == 200
+    assert 1 in [room["id"] for room in response.json()]
+
+
 @pytest.fixture(scope="module")
 async def delete_all_bookings():
     async for db in get_db_null_pool():
         await db.execute(delete(BookingsOrm))  # noqa: F405
+        await db.execute(delete(RoomInventoryOrm))  # noqa: F405
         await db.commit()
 
 
@@ -68,3 +85,101 @@ async def test_add_and_get_my_bookings(
     response_my_bookings = await authenticated_ac.get("/bookings/me")
     assert response_my_bookings.status_code == 200
     assert len(response_my_bookings.json()) == booked_rooms
+
+
+@pytest.mark.parametrize("url", ["/bookings/", "/bookings/me"])
+async def test_get_bookings_by_cursor(url, authenticated_ac):
+    response = await authenticated_ac.get(url, params={"limit": 2})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 2
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await authenticated_ac.get(url, params={"limit": 2, "after": cursor})
+    assert response.status_code == 200
+    second_page = response.json()
+    assert second_page
+    assert second_page[0]["id"] > first_page[-1]["id"]
+
+
+@pytest.mark.parametrize("cursor", BAD_CURSORS)
+@pytest.mark.parametrize("url", ["/bookings/", "/bookings/me"])
+async def test_bad_booking_cursor(url, cursor, authenticated_ac):
+    response = await authenticated_ac.get(url, params={"after": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+async def test_parallel_bookings_do_not_oversell(authenticated_ac):
+    response = await authenticated_ac.post(
+        "/hotels/1/rooms", json={"title": "Последний номер", "price": 1000, "quantity": 2}
+    )
+    room_id = response.json()["id"]
+
+    responses = await asyncio.gather(
+        *(
+            authenticated_ac.post(
+                "/bookings/",
+                json={"room_id": room_id, "date_from": "2024-12-01", "date_to": "2024-12-05"},
+            )
+            for _ in range(6)
+        )
+    )
+    assert sorted(response.status_code for response in responses) == [200, 200, 400, 400, 400, 400]
+
+
+async def test_rooms_calendar(authenticated_ac):
+    response = await authenticated_ac.post(
+        "/hotels/1/rooms", json={"title": "Номер с календарём", "price": 1000, "quantity": 2}
+    )
+    room_id = response.json()["id"]
+    for date_from in ["2030-03-02", "2030-03-03"]:
+        response = await authenticated_ac.post(
+            "/bookings/", json={"room_id": room_id, "date_from": date_from, "date_to": "2030-03-04"}
+        )
+        assert response.status_code == 200
+
+    response = await authenticated_ac.get(
+        "/hotels/1/rooms/calendar", params={"date_from": "2030-03-01", "date_to": "2030-03-05"}
+    )
+    assert response.status_code == 200
+    calendar = response.json()
+    assert calendar["nights"] == ["2030-03-01", "2030-03-02", "2030-03-03", "2030-03-04"]
+    assert calendar["rooms"] == sorted(calendar["rooms"])
+    assert len(calendar["free"]) == len(calendar["rooms"])
+    assert calendar["free"][calendar["rooms"].index(room_id)] == [2, 1, 0, 2]
+
+
+@pytest.mark.parametrize(
+    "url, date_from, date_to, status_code",
+    [
+        ("/hotels/1/rooms/calendar", "2030-03-05", "2030-03-05", 400),
+        ("/hotels/1/rooms/calendar", "2030-01-01", "2031-03-01", 400),
+        ("/hotels/100000/rooms/calendar", "2030-03-01", "2030-03-05", 404),
+    ],
+)
+async def test_rooms_calendar_errors(url, date_from, date_to, status_code, ac):
+    response = await ac.get(url, params={"date_from": date_from, "date_to": date_to})
+    assert response.status_code == status_code
+
+
+async def test_export_bookings(db, ac):
+    bookings_count = await db.scalar(select(func.count()).select_from(BookingsOrm))  # noqa: F405
+
+    response = await ac.get("/bookings/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == bookings_count
+    assert set(rows[0]) == {"id", "user_id", "room_id", "date_from", "date_to", "price"}
+
+    response = await ac.get("/bookings/export", params={"format": "csv", "hotel_id": 1})
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "id,user_id,room_id,date_from,date_to,price"
+    assert len(lines) - 1 == bookings_count
+
+    params = {"hotel_id": 1, "date_from": "2030-01-01", "date_to": "2030-02-01"}
+    response = await ac.get("/bookings/export", params=params)
+    assert response.status_code == 200
+    assert response.text == ""
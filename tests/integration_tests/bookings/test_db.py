@@ -1,6 +1,9 @@
 from datetime import date
 from app.models import *  # noqa: F403
 from sqlalchemy import select, update, delete
+from app.inventory import backfill_inventory
+from app.notifications import notify_checkins
+from tests.conftest import async_session_maker_null_pool
 
 
 async def test_booking_crud(db):
@@ -59,3 +62,81 @@ async def test_booking_crud(db):
     )
     booking = result.scalars().first()
     assert not booking
+
+
+async def test_backfill_inventory(db):
+    booking = BookingsOrm(  # noqa: F405
+        user_id=1,
+        room_id=2,
+        date_from=date(year=2024, month=9, day=1),
+        date_to=date(year=2024, month=9, day=4),
+        price=100,
+    )
+    db.add(booking)
+    await db.commit()
+
+    await backfill_inventory(db)
+    await db.commit()
+
+    result = await db.scalars(
+        select(RoomInventoryOrm).where(RoomInventoryOrm.room_id == 2)  # noqa: F405
+    )
+    nights = {row.night: row.booked for row in result}
+    assert nights == {
+        date(year=2024, month=9, day=1): 1,
+        date(year=2024, month=9, day=2): 1,
+        date(year=2024, month=9, day=3): 1,
+    }
+
+
+class ListSender:
+    def __init__(self):
+        self.batches = []
+
+    async def send(self, letters: list[dict]):
+        self.batches.append([letter["id"] for letter in letters])
+
+
+async def test_notify_checkins(db):
+    day = date(year=2031, month=1, day=1)
+    bookings = [
+        BookingsOrm(user_id=1, room_id=1, date_from=day, date_to=date(2031, 1, 3), price=100)  # noqa: F405
+        for _ in range(3)
+    ]
+    db.add_all(bookings)
+    await db.commit()
+    ids = [booking.id for booking in bookings]
+
+    sender = ListSender()
+    assert await notify_checkins(db, sender, day, batch_size=2) == 3
+    assert sender.batches == [ids[:2], ids[2:]]
+
+    # Only bookings made after the last run are sent
+    assert await notify_checkins(db, sender, day, batch_size=2) == 0
+    booking = BookingsOrm(user_id=1, room_id=1, date_from=day, date_to=date(2031, 1, 2), price=100)  # noqa: F405
+    db.add(booking)
+    await db.commit()
+    assert await notify_checkins(db, sender, day, batch_size=2) == 1
+    assert sender.batches[-1] == [booking.id]
+
+
+async def test_notify_checkins_late_commit(db):
+    day = date(year=2031, month=2, day=1)
+    stay = dict(user_id=1, room_id=1, date_from=day, date_to=date(2031, 2, 2), price=100)
+    async with async_session_maker_null_pool() as other:
+        # Gets the lower id but commits after the higher one is sent
+        late = BookingsOrm(**stay)  # noqa: F405
+        other.add(late)
+        await other.flush()
+        booking = BookingsOrm(**stay)  # noqa: F405
+        db.add(booking)
+        await db.commit()
+
+        sender = ListSender()
+        assert await notify_checkins(db, sender, day) == 1
+        assert sender.batches == [[booking.id]]
+        await other.commit()
+
+    assert late.id < booking.id
+    assert await notify_checkins(db, sender, day) == 1
+    assert sender.batches[-1] == [late.id]
@@ -0,0 +1,73 @@
+import json
+
+
+async def test_import_catalogue(ac, admin_headers):
+    response = await ac.post("/facilities/", json={"title": "Бассейн"})
+    facility_id = response.json()["id"]
+
+    hotels = "\n".join(
+        json.dumps({"id": i, "title": f"Импорт {i}", "location": "Казань"}) for i in (1, 2)
+    )
+    rooms = (
+        "id,hotel_id,title,description,price,quantity\n1,1,Стандарт,,3000,4\n2,2,Люкс,Вид,9000,1\n"
+    )
+    rooms_facilities = f"room_id,facility_id\n2,{facility_id}\n"
+    response = await ac.post(
+        "/catalogue/import",
+        files={
+            "hotels": ("hotels.ndjson", hotels),
+            "rooms": ("rooms.csv", rooms),
+            "rooms_facilities": ("rooms_facilities.csv", rooms_facilities),
+        },
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    assert response.json() == {"hotels": 2, "rooms": 2, "rooms_facilities": 1}
+
+    response = await ac.get("/hotels/", params={"title": "Импорт 2"})
+    hotel_id = response.json()[0]["id"]
+    params = {"date_from": "2024-08-01", "date_to": "2024-08-10"}
+    response = await ac.get(f"/hotels/{hotel_id}/rooms", params=params)
+    assert [(room["title"], room["facilities_ids"]) for room in response.json()] == [
+        ("Люкс", [facility_id])
+    ]
+
+    # New rows still get ids after the imported ones
+    response = await ac.post("/hotels/", json={"title": "После импорта", "location": "Казань"})
+    assert response.status_code == 201
+    assert response.json()["id"] > hotel_id
+
+
+async def test_import_catalogue_reports_row_errors(ac, admin_headers):
+    hotels = '{"id": 1, "title": "Ошибка", "location": "Омск"}\n{"id": 2, "title": \n'
+    rooms = "id,hotel_id,title,price,quantity\n1,1,Номер,много,1\n2,7,Номер,100,1\n"
+    response = await ac.post(
+        "/catalogue/import",
+        files={"hotels": ("hotels.ndjson", hotels), "rooms": ("rooms.csv", rooms)},
+        headers=admin_headers,
+    )
+    assert response.status_code == 422
+    assert [(error["file"], error["line"]) for error in response.json()["detail"]] == [
+        ("hotels", 2),
+        ("rooms", 2),
+        ("rooms", 3),
+    ]
+
+    response = await ac.get("/hotels/", params={"title": "Ошибка"})
+    assert response.json() == []
+
+
+async def test_import_catalogue_rejects_non_utf8(ac, admin_headers):
+    rooms = "id,hotel_id,title,price,quantity\n1,1,Номер,100,1\n".encode("cp1251")
+    response = await ac.post(
+        "/catalogue/import",
+        files={"rooms": ("rooms.csv", rooms)},
+        headers=admin_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "rooms (rooms.csv) is not a UTF-8 file"
+
+
+async def test_import_catalogue_needs_admin_token(ac):
+    response = await ac.post("/catalogue/import", files={"hotels": ("hotels.ndjson", '{"id": 1}')})
+    assert response.status_code == 403
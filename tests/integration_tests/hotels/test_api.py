@@ -1,4 +1,84 @@
+import base64
+
+import pytest
+
+
 async def test_get_hotels(ac):
     response = await ac.get("/hotels/")
 
     assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "params, titles",
+    [
+        ({"title": "resort"}, ["Cosmos Collection Altay Resort", "Bridge Resort"]),
+        ({"title": "ska"}, ["Skala"]),
+        ({"title": "100%"}, []),
+        ({"q": "Bridg Resort"}, ["Bridge Resort"]),
+        ({"q": "Resort"}, ["Cosmos Collection Altay Resort", "Bridge Resort"]),
+    ],
+)
+async def test_search_hotels(params, titles, ac):
+    response = await ac.get("/hotels/", params=params)
+
+    assert response.status_code == 200
+    assert [hotel["title"] for hotel in response.json()] == titles
+
+
+async def test_get_hotels_by_cursor(ac):
+    response = await ac.get("/hotels/", params={"limit": 2})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 2
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await ac.get("/hotels/", params={"limit": 2, "after": cursor})
+    assert response.status_code == 200
+    second_page = response.json()
+    assert second_page
+    assert second_page[0]["id"] > first_page[-1]["id"]
+
+    response = await ac.get("/hotels/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+async def test_get_rooms_by_cursor(ac):
+    params = {"date_from": "2024-09-01", "date_to": "2024-09-05", "limit": 1}
+    response = await ac.get("/hotels/1/rooms", params=params)
+    assert response.status_code == 200
+    [first_room] = response.json()
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await ac.get("/hotels/1/rooms", params={**params, "after": cursor})
+    assert response.status_code == 200
+    [second_room] = response.json()
+    assert second_room["id"] > first_room["id"]
+
+
+def cursor_of(payload: str) -> str:
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+# Valid base64 and JSON, but not an id a query can take
+BAD_CURSORS = [
+    "not-a-cursor",
+    cursor_of('{"id": Infinity}'),
+    cursor_of('{"id": 1099511627776}'),
+    cursor_of('{"id": -1}'),
+    cursor_of("[1]"),
+]
+
+
+@pytest.mark.parametrize("cursor", BAD_CURSORS)
+@pytest.mark.parametrize(
+    "url, params",
+    [
+        ("/hotels/", {}),
+        ("/hotels/1/rooms", {"date_from": "2024-09-01", "date_to": "2024-09-05"}),
+    ],
+)
+async def test_bad_cursor(url, params, cursor, ac):
+    response = await ac.get(url, params={**params, "after": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
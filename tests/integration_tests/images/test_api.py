@@ -0,0 +1,160 @@
+import hashlib
+import io
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.routers import images
+from app.routers.images import IMMUTABLE, NOT_RESIZED
+
+
+def make_png(width: int = 20, height: int = 10) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def media_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MEDIA_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def queued_resizes(monkeypatch):
+    paths = []
+    monkeypatch.setattr(images.resize_image, "delay", paths.append)
+    return paths
+
+
+async def test_upload_new_images(ac, media_dir, queued_resizes):
+    first, second = make_png(), make_png(30, 10)
+    names = [f"{hashlib.sha256(content).hexdigest()}.png" for content in (first, second)]
+
+    response = await ac.post(
+        "/images/",
+        files=[("files", ("first.png", first)), ("files", ("second.png", second))],
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"filename": "first.png", "name": names[0], "duplicate": False},
+        {"filename": "second.png", "name": names[1], "duplicate": False},
+    ]
+    assert sorted(path.name for path in media_dir.iterdir()) == sorted(names)
+    assert (media_dir / names[0]).read_bytes() == first
+    assert queued_resizes == [str(media_dir / name) for name in names]
+
+
+async def test_upload_rejected_part_stores_nothing(ac, media_dir, queued_resizes):
+    response = await ac.post(
+        "/images/",
+        files=[("files", ("good.png", make_png())), ("files", ("bad.png", b"not an image"))],
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("bad.png:")
+    assert list(media_dir.iterdir()) == []
+    assert queued_resizes == []
+
+
+async def test_upload_duplicate_images(ac, media_dir, queued_resizes):
+    content = make_png()
+    name = f"{hashlib.sha256(content).hexdigest()}.png"
+    (media_dir / name).write_bytes(content)
+
+    response = await ac.post(
+        "/images/",
+        files=[("files", ("first.png", content)), ("files", ("second.png", content))],
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"filename": "first.png", "name": name, "duplicate": True},
+        {"filename": "second.png", "name": name, "duplicate": True},
+    ]
+    assert [path.name for path in media_dir.iterdir()] == [name]
+    assert queued_resizes == []
+
+
+@pytest.mark.parametrize(
+    "content, limits, status_code",
+    [
+        (b"not an image", {}, 422),
+        (make_png(), {"MAX_IMAGE_BYTES": 10}, 413),
+        (make_png(), {"MAX_IMAGE_PIXELS": 100}, 413),
+        # Rejected by Content-Length before the body is read
+        (b"x" * 200_000, {"MAX_IMAGE_BYTES": 1000, "MAX_IMAGES_PER_UPLOAD": 1}, 413),
+    ],
+)
+async def test_upload_rejected(ac, media_dir, monkeypatch, content, limits, status_code):
+    for name, value in limits.items():
+        monkeypatch.setattr(settings, name, value)
+
+    response = await ac.post("/images/", files=[("files", ("image.png", content))])
+    assert response.status_code == status_code
+    assert list(media_dir.iterdir()) == []
+
+
+async def test_upload_decompression_bomb(ac, media_dir, monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 50)
+
+    response = await ac.post("/images/", files=[("files", ("bomb.png", make_png()))])
+    assert response.status_code == 413
+    assert list(media_dir.iterdir()) == []
+
+
+@pytest.fixture
+def stored_image(media_dir):
+    name = "a" * 64 + ".jpeg"
+    (media_dir / name).write_bytes(b"original")
+    for size in (1000, 500):
+        (media_dir / f"{'a' * 64}_{size}px.jpeg").write_bytes(f"jpeg {size}".encode())
+        (media_dir / f"{'a' * 64}_{size}px.webp").write_bytes(f"webp {size}".encode())
+    return name
+
+
+@pytest.mark.parametrize(
+    "w, accept, content, cache_control",
+    [
+        (None, "image/webp", b"original", IMMUTABLE),
+        (300, "image/*", b"jpeg 500", IMMUTABLE),
+        (300, "image/webp,image/*", b"webp 500", IMMUTABLE),
+        (800, "image/webp,image/*", b"webp 1000", IMMUTABLE),
+        (2000, "image/webp,image/*", b"original", IMMUTABLE),
+        # The 200px copy is not resized yet
+        (150, "image/*", b"jpeg 500", NOT_RESIZED),
+    ],
+)
+async def test_get_image(ac, stored_image, w, accept, content, cache_control):
+    params = {"w": w} if w else {}
+    response = await ac.get(f"/images/{stored_image}", params=params, headers={"Accept": accept})
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["Cache-Control"] == cache_control
+
+    etag = response.headers["ETag"]
+    response = await ac.get(
+        f"/images/{stored_image}", params=params, headers={"Accept": accept, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
+async def test_get_image_range(ac, stored_image):
+    response = await ac.get(f"/images/{stored_image}", headers={"Range": "bytes=2-4"})
+    assert response.status_code == 206
+    assert response.content == b"igi"
+
+
+@pytest.mark.parametrize("name", ["../secret.jpeg", "b" * 64 + ".jpeg", "a" * 64 + ".gif"])
+async def test_get_missing_image(ac, stored_image, name):
+    response = await ac.get(f"/images/{name}")
+    assert response.status_code == 404
+
+
+async def test_get_image_through_nginx(ac, stored_image, monkeypatch):
+    monkeypatch.setattr(settings, "MEDIA_ACCEL_PREFIX", "/media-files/")
+
+    response = await ac.get(f"/images/{stored_image}", params={"w": 300})
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["X-Accel-Redirect"] == f"/media-files/{'a' * 64}_500px.jpeg"
+    assert response.headers["Content-Type"] == "image/jpeg"
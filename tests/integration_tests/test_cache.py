@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import update
+
+from app.cache import CACHE_EXPIRE, stats
+from app.models import RoomsOrm
+from app.routers import hotels, rooms
+from tests.conftest import real_cache
+
+STAY = {"date_from": "2031-05-01", "date_to": "2031-05-03"}
+
+
+@pytest.fixture
+def cached_reads(fake_redis, monkeypatch):
+    # @cache is turned off for the tests, the reads checked here get the real one back
+    monkeypatch.setattr(
+        hotels,
+        "search_hotels",
+        real_cache(expire=CACHE_EXPIRE, key_builder=hotels.search_key)(hotels.search_hotels),
+    )
+    monkeypatch.setattr(
+        rooms,
+        "find_rooms",
+        real_cache(expire=CACHE_EXPIRE, key_builder=rooms.rooms_key)(rooms.find_rooms),
+    )
+
+
+async def get_room_titles(ac, hotel_id: int) -> dict[int, str]:
+    response = await ac.get(f"/hotels/{hotel_id}/rooms", params=STAY)
+    assert response.status_code == 200
+    return {room["id"]: room["title"] for room in response.json()}
+
+
+async def test_edit_room_refreshes_cached_rooms(cached_reads, db, ac):
+    response = await ac.post(
+        "/hotels/2/rooms", json={"title": "До правки", "price": 1000, "quantity": 1}
+    )
+    room_id = response.json()["id"]
+    assert (await get_room_titles(ac, 2))[room_id] == "До правки"
+
+    # A change behind the API's back is not seen, the read is served from the cache
+    await db.execute(update(RoomsOrm).where(RoomsOrm.id == room_id).values(title="Мимо кэша"))
+    await db.commit()
+    hits = stats["local_hits"]
+    assert (await get_room_titles(ac, 2))[room_id] == "До правки"
+    assert stats["local_hits"] == hits + 1
+
+    response = await ac.patch(f"/hotels/2/rooms/{room_id}", json={"title": "После правки"})
+    assert response.status_code == 200
+    assert (await get_room_titles(ac, 2))[room_id] == "После правки"
+
+
+async def test_add_booking_refreshes_cached_rooms(cached_reads, authenticated_ac):
+    response = await authenticated_ac.post(
+        "/hotels/3/rooms", json={"title": "Единственный", "price": 1000, "quantity": 1}
+    )
+    room_id = response.json()["id"]
+    assert room_id in await get_room_titles(authenticated_ac, 3)
+
+    response = await authenticated_ac.post("/bookings/", json={"room_id": room_id, **STAY})
+    assert response.status_code == 200
+    assert room_id not in await get_room_titles(authenticated_ac, 3)
+
+
+async def test_create_hotel_refreshes_cached_search(cached_reads, ac):
+    params = {"title": "Свежий кэш"}
+    response = await ac.get("/hotels/", params=params)
+    assert response.json() == []
+
+    response = await ac.post("/hotels/", json={"title": "Свежий кэш", "location": "Тверь"})
+    assert response.status_code == 201
+    response = await ac.get("/hotels/", params=params)
+    assert [hotel["title"] for hotel in response.json()] == ["Свежий кэш"]
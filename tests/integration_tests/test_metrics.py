@@ -0,0 +1,15 @@
+async def test_metrics(ac):
+    await ac.get("/hotels/1/rooms/1")
+    await ac.get("/no/such/page")
+
+    response = await ac.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert (
+        'http_requests_total{method="GET",route="/hotels/{hotel_id}/rooms/{room_id}",status="200"}'
+        in text
+    )
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in text
+    assert 'http_requests_in_progress{method="GET"} 1.0' in text
+    assert "db_query_duration_seconds_count" in text
@@ -0,0 +1,54 @@
+import time
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.config import settings
+from app.middleware import ProfileMiddleware
+
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def test_worker_profile(ac, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+
+    response = await ac.get("/admin/profile", params={"seconds": 0.1})
+    assert response.status_code == 403
+    response = await ac.get(
+        "/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "wrong"}
+    )
+    assert response.status_code == 403
+
+    response = await ac.get(
+        "/admin/profile", params={"seconds": 0.2}, headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 200
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert ";" in stack
+
+
+async def test_request_profile(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    app = FastAPI()
+    app.add_middleware(ProfileMiddleware)
+
+    @app.get("/slow")
+    async def slow():
+        spin(0.2)
+        return {"ok": True}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/slow")
+        assert response.json() == {"ok": True}
+
+        response = await client.get("/slow", headers={"X-Profile": "1"})
+        assert response.json() == {"ok": True}
+
+        response = await client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+        assert response.headers["X-Profiled-Status"] == "200"
+        assert "spin (tests/integration_tests/test_profiler.py" in response.text
@@ -0,0 +1,39 @@
+import pytest
+
+from app import main
+
+# Statements per request, a new N+1 or a redundant round trip shows up here first
+QUERY_BUDGETS = [
+    ("get", "/hotels/", {"date_from": "2024-08-01", "date_to": "2024-08-10"}, 1),
+    ("get", "/hotels/1", None, 1),
+    ("get", "/hotels/1/rooms", {"date_from": "2024-08-01", "date_to": "2024-08-10"}, 3),
+    ("get", "/hotels/1/rooms/1", None, 3),
+    ("get", "/hotels/1/rooms/calendar", {"date_from": "2024-08-01", "date_to": "2024-09-01"}, 1),
+    ("get", "/facilities/", None, 1),
+    ("get", "/bookings/me", None, 1),
+    ("patch", "/hotels/1", {"title": "Budget hotel"}, 1),
+    ("patch", "/hotels/1/rooms/1", {"price": 5000}, 2),
+    ("put", "/hotels/1/rooms/1", {"title": "Budget room", "price": 5000, "quantity": 5}, 2),
+    ("post", "/bookings/", {"room_id": 1, "date_from": "2024-10-01", "date_to": "2024-10-03"}, 4),
+]
+
+
+@pytest.mark.parametrize("method, url, params, budget", QUERY_BUDGETS)
+async def test_query_budget(authenticated_ac, query_budget, method, url, params, budget):
+    with query_budget(budget):
+        if method == "get":
+            response = await authenticated_ac.get(url, params=params)
+        else:
+            response = await authenticated_ac.request(method, url, json=params)
+    assert response.status_code < 300
+
+
+async def test_debug_headers(ac, monkeypatch):
+    monkeypatch.setattr(main.settings, "DEBUG", True)
+    response = await ac.get("/facilities/")
+    assert int(response.headers["X-DB-Queries"]) >= 1
+    assert response.headers["X-DB-Time"].endswith("ms")
+
+    monkeypatch.setattr(main.settings, "DEBUG", False)
+    response = await ac.get("/facilities/")
+    assert "X-DB-Queries" not in response.headers
@@ -0,0 +1,141 @@
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import event, text
+
+from app.inventory import backfill_inventory
+from app.notifications import checkin_batch
+from tests.conftest import async_session_maker_null_pool, engine_null_pool
+
+# Tables that grow with the business; the hot paths must reach them through an index
+INDEXED_TABLES = {"bookings", "rooms", "rooms_facilities", "room_inventory"}
+
+SEED_DATA = [
+    """
+    INSERT INTO hotels (title, location)
+    SELECT 'Seed hotel ' || i, 'Seed street ' || i
+    FROM generate_series(1, 100000) AS i
+    """,
+    """
+    INSERT INTO rooms (hotel_id, title, price, quantity)
+    SELECT hotels.id, 'Seed room ' || i, 1000 + i, 3
+    FROM (SELECT id FROM hotels ORDER BY id LIMIT 2000) AS hotels, generate_series(1, 10) AS i
+    """,
+    """
+    INSERT INTO facilities (title)
+    SELECT 'Seed facility ' || i FROM generate_series(1, 50) AS i
+    """,
+    """
+    INSERT INTO rooms_facilities (room_id, facility_id)
+    SELECT rooms.id, seed_facilities.first_id + (rooms.id + i * 7) % 50
+    FROM rooms,
+        generate_series(0, 1) AS i,
+        (SELECT min(id) AS first_id FROM facilities WHERE title LIKE 'Seed%') AS seed_facilities
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO users (email, hashed_password)
+    SELECT 'seed' || i || '@example.com', 'hash' FROM generate_series(1, 1000) AS i
+    """,
+    """
+    INSERT INTO bookings (user_id, room_id, date_from, date_to, price)
+    SELECT
+        seed_users.first_id + (rooms.id + i) % 1000,
+        rooms.id,
+        date '2024-01-01' + (rooms.id * 7 + i * 31) % 365,
+        date '2024-01-01' + (rooms.id * 7 + i * 31) % 365 + 3,
+        3000
+    FROM rooms,
+        generate_series(0, 3) AS i,
+        (SELECT min(id) AS first_id FROM users WHERE email LIKE 'seed%') AS seed_users
+    """,
+]
+
+# Searches must not walk the whole hotels table either
+SEARCH_TABLES = INDEXED_TABLES | {"hotels"}
+
+HOT_REQUESTS = [
+    ("get", "/hotels/", {"date_from": "2024-08-01", "date_to": "2024-08-10"}, INDEXED_TABLES),
+    ("get", "/hotels/", {"location": "Seed street 12345"}, SEARCH_TABLES),
+    ("get", "/hotels/", {"title": "Seed hotel 1234"}, SEARCH_TABLES),
+    ("get", "/hotels/", {"q": "Sed hotel 12345"}, SEARCH_TABLES),
+    (
+        "get",
+        "/hotels/1/rooms",
+        {"date_from": "2024-08-01", "date_to": "2024-08-10"},
+        INDEXED_TABLES,
+    ),
+    ("get", "/hotels/1/rooms/1", None, INDEXED_TABLES),
+    (
+        "get",
+        "/hotels/1/rooms/calendar",
+        {"date_from": "2024-08-01", "date_to": "2024-09-01"},
+        INDEXED_TABLES,
+    ),
+    (
+        "post",
+        "/bookings/",
+        {"room_id": 2, "date_from": "2024-10-01", "date_to": "2024-10-03"},
+        INDEXED_TABLES,
+    ),
+    ("get", "/bookings/me", None, INDEXED_TABLES),
+]
+
+
+@pytest.fixture(scope="module")
+async def hot_statements(authenticated_ac):
+    statements = []
+    tables = INDEXED_TABLES
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters, tables))
+
+    event.listen(engine_null_pool.sync_engine, "before_cursor_execute", capture)
+    try:
+        for method, url, params, tables in HOT_REQUESTS:
+            if method == "get":
+                response = await authenticated_ac.get(url, params=params)
+            else:
+                response = await authenticated_ac.post(url, json=params)
+            assert response.status_code == 200
+    finally:
+        event.remove(engine_null_pool.sync_engine, "before_cursor_execute", capture)
+
+    # The booking_today_checkin task
+    query = checkin_batch(date.today())
+    compiled = query.compile(engine_null_pool.sync_engine)
+    statements.append((str(compiled), tuple(compiled.params.values()), INDEXED_TABLES))
+    return statements
+
+
+def seq_scans(plan: dict) -> set[str]:
+    tables = set()
+    if plan["Node Type"] == "Seq Scan":
+        tables.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        tables |= seq_scans(child)
+    return tables
+
+
+async def test_hot_queries_use_indexes(hot_statements):
+    async with async_session_maker_null_pool() as session:
+        # Everything is rolled back, the rest of the suite keeps the small dataset
+        for statement in SEED_DATA:
+            await session.execute(text(statement))
+        await backfill_inventory(session)
+        # Autovacuum would merge fresh GIN entries into the trigram indexes in production
+        await session.execute(text("SELECT gin_clean_pending_list('ix_hotels_title_trgm')"))
+        await session.execute(text("SELECT gin_clean_pending_list('ix_hotels_location_trgm')"))
+        await session.execute(text("ANALYZE"))
+
+        conn = await session.connection()
+        for statement, parameters, tables in hot_statements:
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scanned = seq_scans(plan[0]["Plan"]) & tables
+            assert not scanned, f"Seq Scan on {scanned} for:\n{statement}"
+        await session.rollback()
@@ -0,0 +1,46 @@
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from starlette.requests import Request
+
+from app import main
+from app.middleware import RequestMiddleware
+from app.database import async_session_maker
+from app.routers import dependencies
+from app.routers.dependencies import READ_PRIMARY_COOKIE, get_read_session_maker
+
+
+def make_request(cookie: str = "") -> Request:
+    return Request({"type": "http", "headers": [(b"cookie", cookie.encode())]})
+
+
+def test_reads_go_to_replica_unless_user_just_wrote(monkeypatch):
+    replica = object()
+    monkeypatch.setattr(dependencies, "replica_session_maker", lambda: replica)
+
+    assert get_read_session_maker(make_request()) is replica
+    assert get_read_session_maker(make_request(f"{READ_PRIMARY_COOKIE}=1")) is async_session_maker
+
+
+async def test_write_sets_read_primary_cookie():
+    app = FastAPI()
+    app.add_middleware(RequestMiddleware, read_your_writes=True)
+
+    @app.api_route("/facilities/", methods=["GET", "POST"])
+    async def facilities():
+        return []
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/facilities/")
+        assert READ_PRIMARY_COOKIE not in response.cookies
+
+        response = await client.post("/facilities/")
+        assert response.status_code == 200
+        assert "Max-Age=5" in response.headers["set-cookie"]
+        assert response.cookies[READ_PRIMARY_COOKIE] == "1"
+
+
+def test_read_your_writes_only_with_replicas():
+    # No DB_REPLICA_URLS in the tests
+    assert not main.replica_session_makers
+    [middleware] = [m for m in main.app.user_middleware if m.cls is RequestMiddleware]
+    assert middleware.kwargs == {"read_your_writes": False}
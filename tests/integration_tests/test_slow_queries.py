@@ -0,0 +1,51 @@
+import asyncio
+
+from app import slow_queries
+from app.config import settings
+from app.slow_queries import is_read_only, redact, redact_plan
+
+
+def test_redact_keeps_only_non_text_values():
+    assert redact(("kot@pes.com", 1, None)) == ["<str len=11>", 1, None]
+    assert redact({"password": b"1234"}) == {"password": "<bytes len=4>"}
+
+
+def test_redact_plan_hides_text_literals():
+    plan = "Filter: ((email)::text = 'kot@pes.com'::text) AND (date_from >= '2024-08-01'::date)"
+    assert redact_plan(plan) == (
+        "Filter: ((email)::text = '<redacted>'::text) AND (date_from >= '2024-08-01'::date)"
+    )
+    assert redact_plan("Index Cond: (title ~~* '%it''s%'::text)") == (
+        "Index Cond: (title ~~* '<redacted>'::text)"
+    )
+
+
+def test_locking_selects_are_not_explained():
+    assert is_read_only("SELECT id FROM rooms")
+    assert not is_read_only("SELECT id FROM rooms FOR UPDATE")
+    assert not is_read_only("SELECT id FROM bookings\nFOR NO KEY UPDATE SKIP LOCKED")
+    assert not is_read_only("select id from rooms for share")
+    assert not is_read_only("UPDATE rooms SET quantity = 1")
+
+
+async def test_slow_queries_are_explained(ac, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(settings, "SLOW_QUERY_SECONDS", 0)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_RATE", 1)
+    slow_queries.slow_queries.clear()
+
+    response = await ac.get(
+        "/hotels/1/rooms", params={"date_from": "2024-08-01", "date_to": "2024-08-10"}
+    )
+    assert response.status_code == 200
+    await asyncio.gather(*slow_queries.explaining)
+    monkeypatch.setattr(settings, "SLOW_QUERY_SECONDS", None)
+
+    response = await ac.get("/admin/slow-queries", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    entries = response.json()
+    assert {entry["route"] for entry in entries} == {"GET /hotels/{hotel_id}/rooms"}
+    plans = [entry["plan"] for entry in entries if entry["plan"]]
+    assert len(plans) == 1
+    assert "actual time" in plans[0]
+    assert "Buffers" in plans[0] or "Planning" in plans[0]
@@ -0,0 +1,205 @@
+import asyncio
+import json
+
+import pytest
+from redis.exceptions import ConnectionError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import cache
+from app.cache import (
+    CACHE_PREFIX,
+    INVALIDATION_CHANNEL,
+    VERSION_PREFIX,
+    TwoTierBackend,
+    listen_invalidations,
+    single_flight,
+    stats,
+    versioned_key,
+)
+
+
+async def get_hotel(hotel_id: int, db: AsyncSession):
+    pass
+
+
+async def test_versioned_key_ignores_session():
+    key_builder = versioned_key("hotel:{hotel_id}")
+
+    key = await key_builder(get_hotel, "test", args=(1, AsyncSession()), kwargs={})
+    same_key = await key_builder(
+        get_hotel, "test", args=(), kwargs={"hotel_id": 1, "db": AsyncSession()}
+    )
+    other_key = await key_builder(get_hotel, "test", args=(2, AsyncSession()), kwargs={})
+
+    assert key == same_key
+    assert key != other_key
+    assert key.startswith("test:")
+
+
+def test_local_tier_is_bounded_lru():
+    backend = TwoTierBackend(None, max_entries=2, expire=60)
+    backend.set_local("a", b"1")
+    backend.set_local("b", b"2")
+    backend.get_local("a")
+    backend.set_local("c", b"3")
+
+    assert backend.get_local("a") == (60, b"1")
+    assert backend.get_local("b") == (0, None)
+    assert backend.get_local("c")[1] == b"3"
+
+
+def test_local_tier_respects_expire():
+    backend = TwoTierBackend(None, expire=60)
+    backend.set_local("a", b"1", expire=-1)
+    backend.set_local("b", b"2", expire=5)
+
+    assert backend.get_local("a")[0] == 60
+    assert backend.get_local("b")[0] == 5
+
+
+async def eventually(condition, timeout: float = 3):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+
+@pytest.fixture
+async def listener(fake_redis, monkeypatch):
+    """listen_invalidations running in the background, yields the pubsubs it opened."""
+    pubsubs = []
+    open_pubsub = fake_redis.pubsub
+
+    def pubsub():
+        pubsubs.append(open_pubsub())
+        return pubsubs[-1]
+
+    monkeypatch.setattr(fake_redis, "pubsub", pubsub)
+    task = asyncio.create_task(listen_invalidations())
+    await eventually(lambda: pubsubs and pubsubs[-1].subscribed)
+    yield pubsubs
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_invalidation_from_another_worker(fake_redis, listener):
+    key_builder = versioned_key("hotel:{hotel_id}")
+    key = await key_builder(get_hotel, "test", args=(1, None), kwargs={})
+    assert "hotel:1" in cache.local_versions
+
+    # Another worker bumps the version: without the message the local version is still used
+    await fake_redis.incr(f"{VERSION_PREFIX}:hotel:1")
+    assert await key_builder(get_hotel, "test", args=(1, None), kwargs={}) == key
+
+    await fake_redis.publish(INVALIDATION_CHANNEL, json.dumps(["hotel:1"]))
+    await eventually(lambda: "hotel:1" not in cache.local_versions)
+    assert await key_builder(get_hotel, "test", args=(1, None), kwargs={}) != key
+
+
+async def test_reconnect_drops_all_local_versions(fake_redis, listener):
+    await cache.get_versions(["catalogue", "hotel:1"])
+    assert set(cache.local_versions) == {"catalogue", "hotel:1"}
+
+    async def connection_lost(*args, **kwargs):
+        raise ConnectionError("connection lost")
+
+    # The listener is blocked in a read, the next one fails
+    listener[0].parse_response = connection_lost
+    await fake_redis.publish(INVALIDATION_CHANNEL, json.dumps([]))
+    await eventually(lambda: not cache.local_versions)
+
+    await eventually(lambda: len(listener) == 2 and listener[1].subscribed)
+
+
+room_key = versioned_key("hotel:{hotel_id}")
+
+
+class Rooms:
+    """A cached function that counts its calls and waits for `release` if given."""
+
+    def __init__(self, release: asyncio.Event | None = None, error: Exception | None = None):
+        self.calls = 0
+        self.release = release
+        self.error = error
+        self.started = asyncio.Event()
+
+    async def __call__(self, hotel_id: int) -> dict:
+        self.calls += 1
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        else:
+            await asyncio.sleep(0.05)
+        if self.error is not None:
+            raise self.error
+        return {"hotel_id": hotel_id, "call": self.calls}
+
+
+def single_flight_rooms(rooms: Rooms):
+    @single_flight(room_key)
+    async def get_rooms(hotel_id: int) -> dict:
+        return await rooms(hotel_id)
+
+    return get_rooms
+
+
+async def test_concurrent_misses_compute_once(fake_redis):
+    rooms = Rooms()
+    cached = single_flight_rooms(rooms)
+    results = await asyncio.gather(*(cached(1) for _ in range(10)))
+
+    assert rooms.calls == 1
+    assert results == [{"hotel_id": 1, "call": 1}] * 10
+
+
+async def test_leader_error_reaches_waiters(fake_redis):
+    rooms = Rooms(error=ValueError("database is down"))
+    cached = single_flight_rooms(rooms)
+    results = await asyncio.gather(*(cached(1) for _ in range(3)), return_exceptions=True)
+
+    assert rooms.calls == 1
+    assert [type(result) for result in results] == [ValueError] * 3
+
+
+async def test_cancelled_leader_hands_over(fake_redis):
+    release = asyncio.Event()
+    rooms = Rooms(release)
+    cached = single_flight_rooms(rooms)
+    leader = asyncio.create_task(cached(1))
+    await rooms.started.wait()
+    waiter = asyncio.create_task(cached(1))
+    await asyncio.sleep(0.01)
+
+    leader.cancel()
+    await asyncio.sleep(0.01)
+    release.set()
+    assert await waiter == {"hotel_id": 1, "call": 2}
+    assert leader.cancelled()
+
+
+async def test_waiter_in_another_process(fake_redis):
+    rooms = Rooms()
+    cached = single_flight_rooms(rooms)
+    key = await room_key(cached, f"{CACHE_PREFIX}:", args=(1,), kwargs={})
+    # Another process holds the lock and stores the value while we wait
+    await fake_redis.set(f"{key}:lock", 1, ex=10)
+    coalesced = stats["coalesced"]
+    waiter = asyncio.create_task(cached(1))
+    await asyncio.sleep(0.1)
+    await fake_redis.set(key, json.dumps({"hotel_id": 1, "call": 0}))
+
+    assert await waiter == {"hotel_id": 1, "call": 0}
+    assert rooms.calls == 0
+    assert stats["coalesced"] == coalesced + 1
+
+
+async def test_waiter_computes_after_lock_expires(fake_redis):
+    rooms = Rooms()
+    cached = single_flight_rooms(rooms)
+    key = await room_key(cached, f"{CACHE_PREFIX}:", args=(1,), kwargs={})
+    # The other process died with the lock held
+    await fake_redis.set(f"{key}:lock", 1, px=200)
+
+    assert await cached(1) == {"hotel_id": 1, "call": 1}
+    assert rooms.calls == 1
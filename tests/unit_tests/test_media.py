@@ -0,0 +1,35 @@
+from PIL import Image
+
+from app.media import make_variants
+
+
+def test_make_variants(tmp_path):
+    image_path = str(tmp_path / "photo.jpeg")
+    Image.new("RGB", (2400, 1600), "blue").save(image_path)
+
+    paths = make_variants(image_path)
+
+    sizes = {}
+    for path in paths:
+        with Image.open(path) as img:
+            sizes[path.removeprefix(str(tmp_path))] = (img.format, img.size)
+    assert sizes == {
+        "/photo_1000px.jpeg": ("JPEG", (1000, 667)),
+        "/photo_1000px.webp": ("WEBP", (1000, 667)),
+        "/photo_500px.jpeg": ("JPEG", (500, 333)),
+        "/photo_500px.webp": ("WEBP", (500, 333)),
+        "/photo_200px.jpeg": ("JPEG", (200, 133)),
+        "/photo_200px.webp": ("WEBP", (200, 133)),
+    }
+
+
+def test_make_variants_does_not_upscale(tmp_path):
+    image_path = str(tmp_path / "small.png")
+    Image.new("RGBA", (300, 100)).save(image_path)
+
+    paths = make_variants(image_path, sizes=[500, 200])
+
+    with Image.open(paths[0]) as img:
+        assert img.size == (300, 100)
+    with Image.open(paths[-1]) as img:
+        assert img.size == (200, 67)
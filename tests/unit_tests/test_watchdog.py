@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from app.watchdog import LoopWatchdog
+
+
+def block_the_loop():
+    time.sleep(0.3)
+
+
+async def test_watchdog_logs_blocking_call(caplog):
+    watchdog = LoopWatchdog(threshold=0.1)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.1)
+        block_the_loop()
+        await asyncio.sleep(0.1)
+    finally:
+        watchdog.stop()
+
+    assert watchdog.stalls == 1
+    assert "in block_the_loop" in caplog.text
+    assert watchdog.percentiles()["max"] >= 0.2